@@ -0,0 +1,306 @@
+# benchmark.py
+"""
+Benchmarks for the monitor's hot paths on synthetic careers.
+
+    python benchmark.py --pilots 10000 --missions 2000 --events 1000000 --out bench.json
+    python benchmark.py --pilots 10000 --out new.json --compare bench.json
+
+A cp.db with the pilot, squadron, mission and event tables is generated in a
+temporary folder (or --workdir), then these are timed (best of --repeat runs):
+  tick_full_scan      first promotion pass after the monitor starts
+  tick_incremental    pass for a new mission after 1% of the pilots changed
+                      (on a career where the earlier passes found nothing left to do)
+  catchup             headless catch-up over every mission of the career
+  certificate_<cc>    each of the four certificate renders (needs Pillow + templates)
+Results are written as JSON; --compare prints the ratio to a previous run.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+from datetime import date, datetime, timedelta
+from config import DEFAULT_THRESHOLDS
+from logger import flush_log
+import promotion
+from sinks import NullSink
+
+SQUADRON_CONFIGS = [101001, 102001, 103001, 201001]  # one per country
+CAREER_START = date(1941, 6, 22)
+BENCH_MAX_RANKS = {"101": 13, "102": 13, "103": 13, "201": 13}
+
+CAREER_SCHEMA = """
+    CREATE TABLE squadron(id INTEGER PRIMARY KEY, configId INTEGER, careerId INTEGER);
+    CREATE TABLE pilot(
+        id INTEGER PRIMARY KEY, squadronId INTEGER, name TEXT, lastName TEXT, birthDay TEXT,
+        description TEXT, commonStat TEXT, personageId TEXT, avatarPath TEXT, AILevel INTEGER,
+        insDate TEXT, isDeleted INTEGER DEFAULT 0, rankId INTEGER, pcp REAL, sorties INTEGER,
+        goodSorties INTEGER, score INTEGER
+    );
+    CREATE TABLE mission(id INTEGER PRIMARY KEY, date TEXT, squadronId INTEGER);
+    CREATE TABLE event(
+        id INTEGER PRIMARY KEY, date TEXT, type INTEGER, pilotId INTEGER, rankId INTEGER,
+        missionId INTEGER, squadronId INTEGER, careerId INTEGER,
+        ipar1 INTEGER, ipar2 INTEGER, ipar3 INTEGER, ipar4 INTEGER,
+        tpar1 TEXT, tpar2 TEXT, tpar3 TEXT, tpar4 TEXT, isDeleted INTEGER
+    );
+    CREATE INDEX idx_event_pilot ON event(pilotId);
+    CREATE INDEX idx_mission_squadron ON mission(squadronId);
+"""
+
+# --- Synthetic career ---
+def generate_career_db(path, pilots=1000, missions=500, events=50000, squadrons=40, seed=1):
+    """
+    Write a cp.db-like career to `path`: `squadrons` squadrons spread over the
+    four countries, one player pilot (in squadron 1) plus AI pilots with random
+    stats, `missions` missions of the player's squadron on consecutive days and
+    `events` sortie events. Returns the path.
+    """
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript(CAREER_SCHEMA)
+    conn.executemany(
+        "INSERT INTO squadron VALUES (?, ?, 1)",
+        [(sq, SQUADRON_CONFIGS[(sq - 1) % len(SQUADRON_CONFIGS)] + sq // len(SQUADRON_CONFIGS))
+         for sq in range(1, squadrons + 1)]
+    )
+
+    def pilot_rows():
+        for pid in range(1, pilots + 1):
+            is_player = pid == pilots  # newest row, as IL-2 does for the player
+            sq = 1 if is_player else rng.randint(1, squadrons)
+            country = SQUADRON_CONFIGS[(sq - 1) % len(SQUADRON_CONFIGS)] // 1000
+            sorties = rng.randint(0, 700)
+            yield (
+                pid, sq, f"Name{pid}", f"Last{pid}",
+                f"startSquadronInfo={sq}&birthCountryInfo={country}&pilotIdx={pid}"
+                if is_player else f"birthCountryInfo={country}&pilotIdx={pid}",
+                "1" if is_player else "",
+                rng.randint(1, 12), round(rng.uniform(0, 1000), 2),
+                sorties, int(sorties * rng.uniform(0.85, 1.0)),
+            )
+    conn.executemany(
+        "INSERT INTO pilot (id, squadronId, name, lastName, description, personageId, "
+        "rankId, pcp, sorties, goodSorties) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        pilot_rows()
+    )
+
+    mission_dates = [(CAREER_START + timedelta(days=i)).strftime("%Y.%m.%d") for i in range(missions)]
+    conn.executemany(
+        "INSERT INTO mission VALUES (?, ?, 1)",
+        [(mid, d) for mid, d in enumerate(mission_dates, 1)]
+    )
+
+    def event_rows():
+        for _ in range(events):
+            mid = rng.randint(1, max(missions, 1))
+            d = mission_dates[mid - 1] if missions else "1941.06.22"
+            yield (f"{d} 00:00:00", rng.randint(1, pilots), rng.randint(1, 12), mid)
+    conn.executemany(
+        "INSERT INTO event (date, type, pilotId, rankId, missionId, isDeleted) "
+        "VALUES (?, 1, ?, ?, ?, 0)",
+        event_rows()
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+# --- Timed sections ---
+def _best_of(repeat, setup, run):
+    """Best wall time of `repeat` runs; setup() is untimed and its result goes to run()."""
+    times, result = [], None
+    for _ in range(repeat):
+        state = setup()
+        started = time.perf_counter()
+        result = run(state)
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+def _fresh_copy(master, workdir, name):
+    folder = os.path.join(workdir, name)
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    return shutil.copy(master, os.path.join(folder, "cp.db"))
+
+
+def bench_mission_tick(master, workdir, repeat, insignia_base):
+    """First (full) pass and an incremental pass after 1% of the pilots changed."""
+    results = {}
+
+    def setup():
+        random.seed(0)
+        promotion.reset_career_caches()
+        conn = promotion.open_career_db(_fresh_copy(master, workdir, "tick"))
+        sq_map = promotion.get_squadron_country_map(conn)
+        last_mid, last_date = conn.execute(
+            "SELECT id, date FROM mission ORDER BY id DESC LIMIT 1").fetchone()
+        return conn, sq_map, last_mid, last_date
+
+    def evaluate(conn, sq_map, mid, mission_date, full):
+        return promotion.evaluate_mission_date(
+            conn, DEFAULT_THRESHOLDS, BENCH_MAX_RANKS, "ENG", insignia_base,
+            1, sq_map, mission_date, latest_mission_id=mid,
+            force_full_scan=full, sink=NullSink()
+        )
+
+    def full_pass(state):
+        conn, sq_map, last_mid, last_date = state
+        try:
+            return len(evaluate(conn, sq_map, last_mid, last_date, True))
+        finally:
+            conn.close()
+    results["tick_full_scan"], promoted = _best_of(repeat, setup, full_pass)
+    results["tick_full_scan_promotions"] = promoted
+
+    def setup_incremental():
+        conn, sq_map, last_mid, last_date = setup()
+        # settle the career first: each pass promotes a pilot by at most one rank
+        full = True
+        for _ in range(len(DEFAULT_THRESHOLDS) + 1):
+            if not evaluate(conn, sq_map, last_mid, last_date, full) and not full:
+                break
+            full = False
+        # the game finishes a mission: new mission row, 1% of the pilots updated
+        pilots = conn.execute("SELECT COUNT(*) FROM pilot").fetchone()[0]
+        conn.execute("UPDATE pilot SET sorties=sorties+1, goodSorties=goodSorties+1, pcp=pcp+25 "
+                     "WHERE id % 100 = 0")
+        next_date = (datetime.strptime(last_date, "%Y.%m.%d") + timedelta(days=1)).strftime("%Y.%m.%d")
+        conn.execute("INSERT INTO mission VALUES (?, ?, 1)", (last_mid + 1, next_date))
+        conn.commit()
+        return conn, sq_map, last_mid + 1, next_date, pilots
+
+    def incremental_pass(state):
+        conn, sq_map, mid, mission_date, _ = state
+        try:
+            promoted = evaluate(conn, sq_map, mid, mission_date, False)
+            promotion.orphan_cleanup_reason(conn)
+            return len(promoted)
+        finally:
+            conn.close()
+    results["tick_incremental"], promoted = _best_of(repeat, setup_incremental, incremental_pass)
+    results["tick_incremental_promotions"] = promoted
+    return results
+
+
+def bench_catchup(master, workdir, repeat, insignia_base):
+    def setup():
+        random.seed(0)
+        return _fresh_copy(master, workdir, "catchup")
+
+    def run(db_path):
+        promotions, passes, _ = promotion.catch_up_career(
+            db_path, DEFAULT_THRESHOLDS, BENCH_MAX_RANKS, "ENG", insignia_base, sink=NullSink()
+        )
+        return len(promotions), passes
+    elapsed, (promotions, passes) = _best_of(repeat, setup, run)
+    return {"catchup": elapsed, "catchup_promotions": promotions, "catchup_passes": passes}
+
+
+def bench_certificates(repeat):
+    """Each certificate generator on its template; skipped if Pillow or a template is missing."""
+    try:
+        from certificates import CERTIFICATE_TEMPLATES, CERTIFICATE_GENERATORS, clear_template_cache
+        from config import RESOURCE_PATH
+    except ImportError as e:
+        print(f"Skipping certificate renders: {e}")
+        return {}
+    codes = {201: "DE", 103: "US", 101: "CCCP", 102: "GB"}
+    results = {}
+    for country, code in codes.items():
+        template = os.path.join(RESOURCE_PATH, CERTIFICATE_TEMPLATES[country])
+        if not os.path.exists(template):
+            print(f"Skipping certificate_{code}: {template} not found")
+            continue
+        generate = CERTIFICATE_GENERATORS[country]
+        args = (template, "Ivan Kozhedub", "Leutnant", "Oberleutnant", "1943.07.05")
+        clear_template_cache(template)
+        started = time.perf_counter()
+        generate(*args)
+        results[f"certificate_{code}_cold"] = time.perf_counter() - started
+        results[f"certificate_{code}"], _ = _best_of(repeat, lambda: None, lambda _: generate(*args))
+    return results
+
+
+# --- Output ---
+def compare(current, previous):
+    """Print each timing next to the previous run's and the ratio."""
+    print(f"{'benchmark':<28}{'previous':>12}{'current':>12}{'ratio':>9}")
+    for key, value in current["results"].items():
+        old = previous.get("results", {}).get(key)
+        if not isinstance(value, float) or not isinstance(old, (int, float)):
+            continue
+        ratio = f"{value / old:.2f}x" if old else "-"
+        print(f"{key:<28}{old:>12.4f}{value:>12.4f}{ratio:>9}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Time the promotion monitor on a synthetic career")
+    parser.add_argument("--pilots", type=int, default=1000)
+    parser.add_argument("--missions", type=int, default=500)
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--squadrons", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark (best is kept)")
+    parser.add_argument("--workdir", help="where the generated databases go (default: a temp folder)")
+    parser.add_argument("--skip-certificates", action="store_true")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rankmod_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    insignia_base = os.path.join(workdir, "charactersranks")  # empty: no rank names needed
+
+    started = time.perf_counter()
+    master = generate_career_db(
+        os.path.join(workdir, "master_cp.db"),
+        pilots=args.pilots, missions=args.missions, events=args.events,
+        squadrons=args.squadrons, seed=args.seed
+    )
+    results = {"generate_db": time.perf_counter() - started}
+    results.update(bench_mission_tick(master, workdir, args.repeat, insignia_base))
+    results.update(bench_catchup(master, workdir, args.repeat, insignia_base))
+    if not args.skip_certificates:
+        results.update(bench_certificates(args.repeat))
+    flush_log()
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+            "pilots": args.pilots, "missions": args.missions, "events": args.events,
+            "squadrons": args.squadrons, "seed": args.seed, "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for key, value in results.items():
+        print(f"{key:<28}{value:>12.4f}" if isinstance(value, float) else f"{key:<28}{value:>12}")
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,14 +5,56 @@ from datetime import datetime, timedelta
 import unicodedata
 import os
 from helpers import get_pil_font, name_to_latin, name_to_cyrillic, spaced_out_name, parse_flexible_date
+from collections import OrderedDict
+import threading
 from config import RESOURCE_PATH
 from logger import log
 
+# --- Template cache ---
+# Decoded RGBA templates keyed by path (and file mtime). Every render gets a
+# copy, so the cached base is never drawn on. Least recently used templates
+# are evicted once the decoded size exceeds TEMPLATE_CACHE_MAX_BYTES
+# (None = no limit).
+TEMPLATE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_template_cache = OrderedDict()
+_template_lock = threading.Lock()
+
+def _image_bytes(img):
+    return img.width * img.height * len(img.getbands())
+
+def load_template(template_path):
+    """Return a private RGBA copy of the certificate template."""
+    mtime = os.path.getmtime(template_path)
+    with _template_lock:
+        cached = _template_cache.get(template_path)
+        if cached and cached[0] == mtime:
+            _template_cache.move_to_end(template_path)
+            return cached[1].copy()
+
+        base = Image.open(template_path).convert("RGBA")
+        _template_cache[template_path] = (mtime, base)
+        if TEMPLATE_CACHE_MAX_BYTES is not None:
+            total = sum(_image_bytes(img) for _, img in _template_cache.values())
+            while total > TEMPLATE_CACHE_MAX_BYTES and len(_template_cache) > 1:
+                path, (_, old) = _template_cache.popitem(last=False)
+                total -= _image_bytes(old)
+                log(f"Evicted certificate template {path} from cache")
+        return base.copy()
+
+def clear_template_cache(template_path=None):
+    """Drop one template (or all of them) from the cache."""
+    with _template_lock:
+        if template_path is None:
+            _template_cache.clear()
+        else:
+            _template_cache.pop(template_path, None)
+
 
 def generate_certificate_image_DE(
     template_path, name, old_rank, new_rank, latest_mission_date_str
 ):
-    cert_img = Image.open(template_path).convert("RGBA")
+    cert_img = load_template(template_path)
     overlay = Image.new("RGBA", cert_img.size, (255,255,255,0))
     draw = ImageDraw.Draw(overlay)
 
@@ -62,7 +104,7 @@ def generate_certificate_image_US(
     name = name_to_latin(name)
     old_rank = name_to_latin(old_rank)
     new_rank = name_to_latin(new_rank)
-    cert_img = Image.open(template_path).convert("RGBA")
+    cert_img = load_template(template_path)
     overlay = Image.new("RGBA", cert_img.size, (255,255,255,0))
     draw = ImageDraw.Draw(overlay)
     image_width, _ = cert_img.size
@@ -157,7 +199,7 @@ def generate_certificate_image_CCCP(
 ) -> Image.Image:
     name = name_to_cyrillic(name)
     new_rank = name_to_cyrillic(new_rank)
-    cert_img = Image.open(template_path).convert("RGBA")
+    cert_img = load_template(template_path)
     overlay = Image.new("RGBA", cert_img.size, (255,255,255,0))
     draw = ImageDraw.Draw(overlay)
 
@@ -196,7 +238,7 @@ def generate_certificate_image_GB(
     name = name_to_latin(name)
     old_rank = name_to_latin(old_rank)
     new_rank = name_to_latin(new_rank)
-    cert_img = Image.open(template_path).convert("RGBA")
+    cert_img = load_template(template_path)
     overlay = Image.new("RGBA", cert_img.size, (255,255,255,0))
     draw    = ImageDraw.Draw(overlay)
     image_width, _ = cert_img.size
@@ -225,3 +267,29 @@ def generate_certificate_image_GB(
         draw.text((x, y), text, font=font, fill=(0,0,0,255))
 
     return Image.alpha_composite(cert_img, overlay)
+
+
+# --- Dispatch ---
+CERTIFICATE_TEMPLATES = {
+    201: "certificate_template.png",
+    103: "Promotion_certificate_US.png",
+    101: "Promotion_certificate_RU.png",
+    102: "promotion_certificate_GB.png",
+}
+
+CERTIFICATE_GENERATORS = {
+    201: generate_certificate_image_DE,
+    103: generate_certificate_image_US,
+    101: generate_certificate_image_CCCP,
+    102: generate_certificate_image_GB,
+}
+
+def generate_certificate_image(country, name, old_rank, new_rank, latest_mission_date_str):
+    """Render the certificate for `country`, or None if there is no template for it."""
+    template_path = os.path.join(RESOURCE_PATH, CERTIFICATE_TEMPLATES.get(country, ""))
+    if country not in CERTIFICATE_GENERATORS or not os.path.exists(template_path):
+        log(f"No template for country {country}, or template not found.")
+        return None
+    return CERTIFICATE_GENERATORS[country](
+        template_path, name, old_rank, new_rank, latest_mission_date_str
+    )
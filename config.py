@@ -17,7 +17,11 @@ else:
 
 CONFIG_FILE       = "promotion_config.json"
 POLL_INTERVAL     = 5  # seconds
+ORPHAN_CLEANUP_INTERVAL = 50  # promotion passes between unconditional orphan cleanups
 LOG_FILE          = "promotion_debug.log"
+RANK_CACHE_FILE   = "rank_catalog_cache.json"
+IMAGE_CACHE_DIR   = "rankmod_image_cache"
+STATE_DB_FILE     = "rankmod_state.db"  # created next to cp.db
 LOCALE_MAP = {
     "RU": "rus", "CHS": "chs", "ENG": "eng", "DEU": "ger",
     "ESP": "spa", "POL": "pol", "FRA": "fra"
@@ -30,10 +34,17 @@ CEREMONY_MAP = {
 }
 
 # --- Config ---
-def load_config() -> dict:
-    if os.path.exists(CONFIG_FILE):
+def load_config(path=CONFIG_FILE, strict=False) -> dict:
+    """
+    Read the promotion config at `path`, filling in defaults for missing keys.
+    A missing or unreadable file gives the built-in defaults, or raises
+    ValueError with strict=True.
+    """
+    if strict and not os.path.exists(path):
+        raise ValueError(f"Config file not found: {path}")
+    if os.path.exists(path):
         try: 
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+            with open(path, "r", encoding="utf-8") as f:
                 cfg = json.load(f)
             # ensure defaults for each country
             defaults = {'101':5,'102':5,'103':5,'201':5}
@@ -41,10 +52,14 @@ def load_config() -> dict:
             # fallback values
             cfg['PROMOTION_COOLDOWN_DAYS'] = int(cfg.get('PROMOTION_COOLDOWN_DAYS', 2))
             cfg['PROMOTION_FAIL_THRESHOLD'] = int(cfg.get('PROMOTION_FAIL_THRESHOLD', 3))
+            cfg['AI_PROMOTION_DIGEST'] = bool(cfg.get('AI_PROMOTION_DIGEST', True))
             return cfg
         except Exception as e:
+            if strict:
+                raise ValueError(f"Failed to load config {path}: {e}") from e
             print(f"Failed to load config: {e}")
     return {"max_ranks": {'101':5, '102':5, '103':5, '201':5},
         "PROMOTION_COOLDOWN_DAYS": 2,
-        "PROMOTION_FAIL_THRESHOLD": 3
+        "PROMOTION_FAIL_THRESHOLD": 3,
+        "AI_PROMOTION_DIGEST": True
     }
@@ -0,0 +1,37 @@
+# eligibility.py
+
+# --- Threshold screening ---
+# Same rule as try_promote, applied to every pilot at once:
+#   4 <= rank < ceiling, thresholds[rank - 4] = (pcp, sorties, max failure) and
+#   pcp >= pcp_req or (sorties >= sorties_req and failure <= failure_max)
+# with failure = (sorties - good) / sorties, or 1.0 without sorties.
+# Only pilots that pass go on to try_promote (cooldown, chance roll, writes).
+MIN_PROMOTABLE_RANK = 4
+
+def parse_pilot_stats(raw_rank, raw_pcp, raw_sorties, raw_good):
+    """(rank, pcp, sorties, good) from a pilot row; unreadable rank/pcp count as 0."""
+    try:
+        rank = int(raw_rank)
+    except (TypeError, ValueError):
+        rank = 0
+    try:
+        pcp = float(raw_pcp)
+    except (TypeError, ValueError):
+        pcp = 0.0
+    return rank, pcp, int(raw_sorties), int(raw_good)
+
+def eligible_mask(ranks, pcps, sorties, goods, ceilings, thresholds) -> list:
+    """
+    One bool per pilot: does it meet the threshold for its next rank?
+    Inputs are parallel sequences as returned by parse_pilot_stats.
+    """
+    mask = []
+    for r, p, s, g, ceiling in zip(ranks, pcps, sorties, goods, ceilings):
+        idx = r - MIN_PROMOTABLE_RANK
+        if not (MIN_PROMOTABLE_RANK <= r < ceiling and idx < len(thresholds)):
+            mask.append(False)
+            continue
+        pr, sr, fr = thresholds[idx]
+        failure = (s - g) / s if s > 0 else 1.0
+        mask.append(p >= pr or (s >= sr and failure <= fr))
+    return mask
@@ -0,0 +1,137 @@
+# headless.py
+"""
+Command-line entry point that runs the promotion logic without Tk or IL-2.
+
+    python headless.py [--db PATH] [--game-path DIR] [--config FILE] catchup [--from-mission ID] [--force]
+    python headless.py [--db PATH] [--game-path DIR] [--config FILE] monitor [--jsonl FILE]
+
+catchup replays, in date order, the missions in a cp.db that neither the
+monitor nor an earlier catch-up has processed (e.g. missions flown while the
+mod was not running) and applies promotions for them. The replay judges every
+pilot by their current stats, since cp.db keeps no history of them. It holds
+one write transaction on cp.db for the whole replay, so it refuses to start
+while IL-2 is running unless --force is given.
+
+monitor is the GUI's mission monitor with notifications written to a JSONL
+file (or stdout) instead of pop-ups. Nothing here imports Tk, ImageTk or the
+certificate code, so it runs on any machine with a copy of cp.db.
+"""
+import os
+import sys
+import json
+import argparse
+from config import CONFIG_FILE, DEFAULT_THRESHOLDS, load_config
+from logger import log, flush_log
+from promotion import catch_up_career, monitor_db, apply_config
+from helpers import is_il2_running
+from sinks import NullSink, CallbackSink, JsonlSink, note_to_record
+
+
+def resolve_paths(args, cfg):
+    """(cp.db path, charactersranks folder) from the arguments or the config."""
+    game_path = args.game_path or cfg.get("game_path")
+    db_path = args.db
+    if db_path is None:
+        if not game_path:
+            raise SystemExit("No cp.db: pass --db or --game-path (or set game_path in the config)")
+        db_path = os.path.join(game_path, "data", "Career", "cp.db")
+    if not game_path:
+        # <game>/data/Career/cp.db
+        game_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(db_path))))
+    insignia_base = os.path.join(game_path, "data", "swf", "il2", "charactersranks")
+    return db_path, insignia_base
+
+
+def cmd_catchup(args, cfg):
+    db_path, insignia_base = resolve_paths(args, cfg)
+    if not os.path.exists(db_path):
+        raise SystemExit(f"cp.db not found: {db_path}")
+    if not args.force and is_il2_running():
+        raise SystemExit("IL-2 is running: close it before the catch-up (or pass --force)")
+    promotions, passes, elapsed = catch_up_career(
+        db_path,
+        cfg.get("thresholds", DEFAULT_THRESHOLDS),
+        cfg["max_ranks"],
+        cfg.get("language", "ENG"),
+        insignia_base,
+        sink=NullSink(),
+        from_mission=args.from_mission,
+    )
+    players = sum(1 for *_, is_player in promotions if is_player)
+    print(f"{len(promotions)} promotions ({players} player) over {passes} mission dates "
+          f"in {elapsed:.2f}s")
+    return 0
+
+
+def cmd_monitor(args, cfg):
+    db_path, insignia_base = resolve_paths(args, cfg)
+    if not os.path.exists(db_path):
+        raise SystemExit(f"cp.db not found: {db_path}")
+    if args.jsonl:
+        sink = JsonlSink(args.jsonl)
+    else:
+        sink = CallbackSink(lambda note: print(json.dumps(note_to_record(note), ensure_ascii=False),
+                                               flush=True))
+    keep_running = is_il2_running if args.stop_with_il2 else (lambda: True)
+    log(f"[HEADLESS] Monitoring {db_path}")
+    try:
+        monitor_db(
+            db_path,
+            cfg.get("thresholds", DEFAULT_THRESHOLDS),
+            cfg["max_ranks"],
+            cfg.get("language", "ENG"),
+            insignia_base,
+            sink=sink,
+            keep_running=keep_running,
+        )
+    except KeyboardInterrupt:
+        log("[HEADLESS] Monitor interrupted")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="IL-2 rank promotion mod without the UI")
+    parser.add_argument("--db", help="path to cp.db (default: <game_path>/data/Career/cp.db)")
+    parser.add_argument("--game-path", help="IL-2 install folder (default: game_path from the config)")
+    parser.add_argument("--config", help=f"config file; must exist and parse (default: {CONFIG_FILE})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    catchup = sub.add_parser("catchup", help="apply promotions for every mission in cp.db")
+    catchup.add_argument("--from-mission", type=int, default=None,
+                         help="only replay missions with a higher id "
+                              "(default: after the last mission already processed)")
+    catchup.add_argument("--force", action="store_true",
+                         help="run even while il-2.exe is running (it shares cp.db)")
+    catchup.set_defaults(func=cmd_catchup)
+
+    monitor = sub.add_parser("monitor", help="watch cp.db for new missions without the UI")
+    monitor.add_argument("--jsonl", help="append notifications to this file (default: print to stdout)")
+    monitor.add_argument("--stop-with-il2", action="store_true",
+                         help="stop when il-2.exe exits (default: run until interrupted)")
+    monitor.set_defaults(func=cmd_monitor)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.config is None:
+        cfg = load_config()
+    else:
+        # A mistyped --config must not run with the default ceilings
+        try:
+            cfg = load_config(args.config, strict=True)
+        except ValueError as e:
+            raise SystemExit(str(e))
+    # promotion.py read the default config at import; use this one instead
+    apply_config(cfg)
+    try:
+        return args.func(args, cfg)
+    except Exception as e:
+        log(f"[HEADLESS] {args.command} failed: {e}")
+        raise
+    finally:
+        flush_log()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
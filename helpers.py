@@ -4,19 +4,66 @@ import ctypes
 import unicodedata
 import sqlite3
 from datetime import datetime
+from functools import lru_cache
 from logger import log
 from config import RESOURCE_PATH
 
 
 # --- Helpers ---
-def is_il2_running() -> bool:
-    for p in psutil.process_iter(("name",)):
+IL2_PROCESS_NAME = "il-2.exe"
+
+class PsutilProcessProvider:
+    """Process table backed by psutil (the real machine)."""
+
+    def iter_processes(self):
+        """Yield (pid, name, create_time) for every running process."""
+        for p in psutil.process_iter(("pid", "name", "create_time")):
+            try:
+                yield p.info["pid"], p.info["name"], p.info["create_time"]
+            except:
+                pass
+
+    def is_running(self, pid, create_time) -> bool:
+        """True if `pid` still exists and is the same process (not a reused pid)."""
+        if not psutil.pid_exists(pid):
+            return False
         try:
-            if p.info["name"] and p.info["name"].lower() == "il-2.exe":
+            return psutil.Process(pid).create_time() == create_time
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return False
+
+
+class ProcessWatcher:
+    """
+    Finds a process by name once, then only re-checks that pid/create time.
+    The full process scan is repeated only after the cached process has died.
+    `provider` needs iter_processes() and is_running(pid, create_time), so a
+    fake process table can be plugged in.
+    """
+
+    def __init__(self, name=IL2_PROCESS_NAME, provider=None):
+        self.name = name.lower()
+        self.provider = provider or PsutilProcessProvider()
+        self.pid = None
+        self.create_time = None
+
+    def is_running(self) -> bool:
+        if self.pid is not None:
+            if self.provider.is_running(self.pid, self.create_time):
                 return True
-        except:
-            pass
-    return False
+            self.pid = self.create_time = None
+
+        for pid, name, create_time in self.provider.iter_processes():
+            if name and name.lower() == self.name:
+                self.pid, self.create_time = pid, create_time
+                return True
+        return False
+
+
+_il2_watcher = ProcessWatcher()
+
+def is_il2_running() -> bool:
+    return _il2_watcher.is_running()
 
 # Optionally support transliteration if installed
 try:
@@ -102,14 +149,91 @@ def spaced_out_name(full_name):
     else:
         return "\u00A0".join(full_name)
         
-def cleanup_orphaned_promotion_attempts(conn):
+# ---- Pilot description parsing ----
+def parse_pilot_description(description):
+    """Split IL-2's 'key=value&key=value' pilot description into a dict."""
+    parsed = {}
+    for part in (description or "").split("&"):
+        key, sep, value = part.partition("=")
+        if sep and key not in parsed:
+            parsed[key] = value
+    return parsed
+
+class PilotDescriptionIndex:
+    """
+    Parsed pilot descriptions by pilot id, plus player pilots (non-empty
+    personageId) by their startSquadronInfo. A row is only parsed again when
+    its description text changed.
+    """
+
+    def __init__(self):
+        self.by_pilot = {}           # pilotId -> (description, parsed, is_personage)
+        self.by_start_squadron = {}  # startSquadronInfo -> {pilotId, ...}
+        self.max_pilot_id = 0
+
+    def clear(self):
+        self.by_pilot.clear()
+        self.by_start_squadron.clear()
+        self.max_pilot_id = 0
+
+    def update(self, pilot_id, description, personage_id) -> dict:
+        """Index one pilot row; returns its parsed description."""
+        is_personage = bool(personage_id)
+        cached = self.by_pilot.get(pilot_id)
+        if cached and cached[0] == description and cached[2] == is_personage:
+            return cached[1]
+        if cached:
+            old_sq = cached[1].get("startSquadronInfo")
+            self.by_start_squadron.get(old_sq, set()).discard(pilot_id)
+
+        parsed = parse_pilot_description(description)
+        self.by_pilot[pilot_id] = (description, parsed, is_personage)
+        if is_personage and "startSquadronInfo" in parsed:
+            self.by_start_squadron.setdefault(parsed["startSquadronInfo"], set()).add(pilot_id)
+        self.max_pilot_id = max(self.max_pilot_id, pilot_id)
+        return parsed
+
+    def refresh(self, conn):
+        """Index the pilots created since the last refresh (all of them the first time)."""
+        rows = conn.execute(
+            "SELECT id, description, personageId FROM pilot WHERE id > ? ORDER BY id",
+            (self.max_pilot_id,)
+        ).fetchall()
+        for pilot_id, description, personage_id in rows:
+            self.update(pilot_id, description, personage_id)
+
+    def campaign_country(self, squadron_id, default):
+        """birthCountryInfo of the (lowest-id) player pilot who started in squadron_id."""
+        pilots = self.by_start_squadron.get(str(squadron_id))
+        if not pilots:
+            return default
+        parsed = self.by_pilot[min(pilots)][1]
+        if "birthCountryInfo" not in parsed:
+            return default
+        try:
+            return int(parsed["birthCountryInfo"])
+        except ValueError:
+            log(f"Failed parsing player country for sq {squadron_id}; using {default}")
+            return default
+
+def cleanup_orphaned_promotion_attempts(conn, reason="manual") -> int:
+    """
+    Drop promotion_attempts rows of pilots that no longer exist. Each run is
+    recorded in rankmod.cleanup_runs; returns the number of rows removed.
+    """
     cur = conn.cursor()
     cur.execute("""
-        DELETE FROM promotion_attempts
-        WHERE pilotId NOT IN (SELECT id FROM pilot)
+        DELETE FROM rankmod.promotion_attempts
+        WHERE pilotId NOT IN (SELECT id FROM main.pilot)
     """)
+    removed = cur.rowcount
+    cur.execute(
+        "INSERT INTO rankmod.cleanup_runs (ranOn, removed, reason) VALUES (?, ?, ?)",
+        (datetime.now().isoformat(timespec="seconds"), removed, reason)
+    )
     conn.commit()
-    log("[CLEANUP] Removed orphaned entries from promotion_attempts")
+    log(f"[CLEANUP] Removed {removed} orphaned entries from promotion_attempts ({reason})")
+    return removed
 
 # ---- Tkinter font (for UI widgets) ----    
 def get_tk_font(text, size=16, weight="normal", context="ui"):
@@ -119,11 +243,22 @@ def get_tk_font(text, size=16, weight="normal", context="ui"):
     return tkfont.Font(family=family, size=size, weight=weight)
 
 # ---- PIL font (for image drawing) ----
-def get_pil_font(text, size=22, context="ui"):
+PIL_FONT_CACHE_SIZE = 32
+
+@lru_cache(maxsize=PIL_FONT_CACHE_SIZE)
+def _load_pil_font(path, size):
     from PIL import ImageFont
+    return ImageFont.truetype(path, size)
+
+def get_pil_font(text, size=22, context="ui"):
+    """Loaded FreeType faces are shared, keyed by (font file, size), LRU-evicted."""
     _, font_file = get_font_info(text, context)
     path = os.path.join(RESOURCE_PATH, font_file)
-    return ImageFont.truetype(path, size)
+    return _load_pil_font(path, size)
+
+def pil_font_cache_info():
+    """hits/misses/maxsize/currsize of the PIL font cache."""
+    return _load_pil_font.cache_info()
     
 # ---- Name transliteration helpers ----
 
@@ -150,37 +285,71 @@ def name_to_cyrillic(name):
         return translit(pinyin, 'ru')
     return name
 
-def migrate_player_stats_by_description_if_needed(conn: sqlite3.Connection, new_pilot_id: int) -> bool:
+# ---- Player stats migration ----
+# Fields to keep from the NEW player row (never copied from the old one)
+PROTECTED_PILOT_COLUMNS = {
+    "id", "squadronId", "name", "lastName", "birthDay", "description", "commonStat",
+    "personageId", "avatarPath", "AILevel", "insDate", "isDeleted"
+}
+
+_pilot_columns   = {}  # cp.db file -> (schema_version, [updatable pilot columns])
+_migrated_pilots = {}  # state db file -> {newPilotId, ...} already migrated
+
+def _database_files(conn) -> dict:
+    return {row[1]: row[2] for row in conn.execute("PRAGMA database_list").fetchall()}
+
+def _updatable_pilot_columns(conn, db_file) -> list:
+    """pilot columns outside PROTECTED_PILOT_COLUMNS, re-read only when the schema changes."""
+    version = conn.execute("PRAGMA main.schema_version").fetchall()[0][0]
+    cached = _pilot_columns.get(db_file)
+    if cached and cached[0] == version:
+        return cached[1]
+    cols = [r[1] for r in conn.execute("PRAGMA main.table_info(pilot)").fetchall()]
+    updatable = [c for c in cols if c not in PROTECTED_PILOT_COLUMNS]
+    _pilot_columns[db_file] = (version, updatable)
+    return updatable
+
+def _migrated_pilot_ids(conn, state_file) -> set:
+    """newPilotIds in rankmod_player_migrations, loaded once per state database."""
+    ids = _migrated_pilots.get(state_file)
+    if ids is None:
+        ids = {r[0] for r in conn.execute(
+            "SELECT newPilotId FROM rankmod.rankmod_player_migrations"
+        ).fetchall()}
+        _migrated_pilots[state_file] = ids
+    return ids
+
+def forget_migrated_pilots():
+    """Drop the in-memory migration markers (after a rollback); they are reloaded on demand."""
+    _migrated_pilots.clear()
+
+def migrate_player_stats_by_description_if_needed(conn: sqlite3.Connection, new_pilot_id: int,
+                                                  commit=True) -> bool:
     """
     When IL-2 creates a NEW player pilot row (new_pilot_id) for the same 'description',
     copy stats from the closest lower-id pilot with the same description.
 
-    Runs ONCE per new_pilot_id using a marker table:
-      rankmod_player_migrations(oldPilotId, newPilotId PRIMARY KEY, migratedOn)
+    Runs ONCE per new_pilot_id using a marker table in the state database
+    (see state_db.py):
+      rankmod.rankmod_player_migrations(oldPilotId, newPilotId PRIMARY KEY, migratedOn)
+    The marker table is read once per state database and kept in memory.
+    commit=False leaves the copy in the caller's open transaction; a caller
+    that rolls back must call forget_migrated_pilots().
 
     Returns True if migration was performed, False otherwise.
     """
     if not new_pilot_id:
         return False
 
-    cur = conn.cursor()
-
-    # Ensure marker table exists
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS rankmod_player_migrations (
-            oldPilotId INTEGER,
-            newPilotId INTEGER PRIMARY KEY,
-            migratedOn TEXT
-        )
-    """)
+    files = _database_files(conn)
+    migrated = _migrated_pilot_ids(conn, files.get("rankmod"))
 
     # Already migrated for this new pilot?
-    if cur.execute(
-        "SELECT 1 FROM rankmod_player_migrations WHERE newPilotId=? LIMIT 1",
-        (new_pilot_id,)
-    ).fetchone():
+    if new_pilot_id in migrated:
         return False
 
+    cur = conn.cursor()
+
     # Load new pilot + description
     row = cur.execute("""
         SELECT description
@@ -210,39 +379,27 @@ def migrate_player_stats_by_description_if_needed(conn: sqlite3.Connection, new_
 
     old_pilot_id = int(old_row[0])
 
-    # Fields to keep from the NEW player row (do NOT overwrite these):
-    # id, squadronID, name, lastName, birthDay, description, commonStat,
-    # personageID, avatarPath, AILevel, insDate, isDeleted
-    #
-    # Approach:
-    # 1) Read columns from PRAGMA table_info(pilot)
-    # 2) Build dynamic UPDATE list for all columns except protected ones
-    protected = {
-        "id", "squadronId", "name", "lastName", "birthDay", "description", "commonStat",
-        "personageId", "avatarPath", "AILevel", "insDate", "isDeleted"
-    }
-
-    # Get pilot table columns
-    cols = [r[1] for r in cur.execute("PRAGMA table_info(pilot)").fetchall()]
-    updatable = [c for c in cols if c not in protected]
-
+    updatable = _updatable_pilot_columns(conn, files.get("main"))
     if not updatable:
         log("[MIGRATE] No updatable columns found in pilot table.")
         return False
 
-    # Build: UPDATE pilot SET col1=(SELECT col1 FROM pilot WHERE id=?), ...
-    set_clause = ", ".join([f"{c} = (SELECT {c} FROM pilot WHERE id=?)" for c in updatable])
-    params = [old_pilot_id] * len(updatable) + [new_pilot_id]
-
-    sql = f"UPDATE pilot SET {set_clause} WHERE id=?"
-    cur.execute(sql, params)
+    # One fetch of the old row, one parameterised UPDATE of the new one
+    columns = ", ".join(f'"{c}"' for c in updatable)
+    values = cur.execute(
+        f"SELECT {columns} FROM pilot WHERE id=?", (old_pilot_id,)
+    ).fetchone()
+    set_clause = ", ".join(f'"{c}" = ?' for c in updatable)
+    cur.execute(f"UPDATE pilot SET {set_clause} WHERE id=?", (*values, new_pilot_id))
 
     # Mark migration done
     cur.execute("""
-        INSERT INTO rankmod_player_migrations(oldPilotId, newPilotId, migratedOn)
+        INSERT INTO rankmod.rankmod_player_migrations(oldPilotId, newPilotId, migratedOn)
         VALUES (?, ?, datetime('now'))
     """, (old_pilot_id, new_pilot_id))
 
-    conn.commit()
+    if commit:
+        conn.commit()
+    migrated.add(new_pilot_id)
     log(f"[MIGRATE] Copied stats old={old_pilot_id} → new={new_pilot_id} (desc match).")
     return True
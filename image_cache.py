@@ -0,0 +1,66 @@
+# image_cache.py
+import os
+import hashlib
+import threading
+from PIL import Image
+from config import IMAGE_CACHE_DIR
+from logger import log
+
+# --- Pre-scaled image cache ---
+# Resized copies of the ceremony and insignia PNGs are kept on disk under
+# IMAGE_CACHE_DIR, keyed by the SHA-1 of the source file, the target size and
+# the resampling filter. The inputs never change for an install, so after the
+# first popup only the small, already-sized PNG has to be decoded.
+
+_digests = {}  # path -> ((mtime_ns, size), sha1 hex)
+_cache_lock = threading.Lock()
+
+def _source_digest(path):
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _digests.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _digests[path] = (stamp, digest)
+    return digest
+
+def load_scaled(path, size=None, factor=None, resample=Image.LANCZOS):
+    """
+    Return the image at `path` resized to `size` (w, h) or scaled by `factor`,
+    loading it from the disk cache when this variant was made before.
+    """
+    src = Image.open(path)  # lazy: only the header is read here
+    if size is None:
+        size = (int(src.width * factor), int(src.height * factor))
+    size = tuple(size)
+    if size == src.size:
+        src.load()
+        return src
+
+    with _cache_lock:
+        digest = _source_digest(path)
+    cached_path = os.path.join(
+        IMAGE_CACHE_DIR, f"{digest[:16]}_{size[0]}x{size[1]}_f{int(resample)}.png"
+    )
+    if os.path.exists(cached_path):
+        try:
+            img = Image.open(cached_path)
+            img.load()
+            return img
+        except Exception as e:
+            log(f"Discarding unreadable cached image {cached_path}: {e}")
+
+    img = src.resize(size, resample)
+    try:
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        tmp = f"{cached_path}.{threading.get_ident()}.tmp"
+        img.save(tmp, format="PNG")
+        os.replace(tmp, cached_path)
+    except OSError as e:
+        log(f"Failed to cache scaled image {cached_path}: {e}")
+    return img
@@ -1,7 +1,13 @@
-#import os
+import os
 import time
+import queue
+import atexit
+import threading
 from config import LOG_FILE
 
+MISSION_MARKER    = "=== Mission Start:"
+LOG_KEEP_MISSIONS = 10
+
 # --- Logging ---
 def trim_log_to_last_n_missions(path, n):
     """
@@ -24,7 +30,159 @@ def trim_log_to_last_n_missions(path, n):
         pass
 
 
+# --- Mission index ---
+# Byte offsets of the mission-start lines in LOG_FILE. Built once from the
+# file, then kept up to date by the writer so that trimming happens once per
+# new mission instead of re-reading the whole file on every call.
+_mission_offsets = None
+_log_lock = threading.Lock()
+
+def _scan_mission_offsets(path):
+    offsets = []
+    marker = MISSION_MARKER.encode("utf-8")
+    try:
+        with open(path, "rb") as f:
+            pos = 0
+            for line in f:
+                if marker in line:
+                    offsets.append(pos)
+                pos += len(line)
+    except OSError:
+        pass
+    return offsets
+
+def _drop_oldest_missions(path, offsets, n):
+    """Cut everything before the n-th newest mission start; returns the new offsets."""
+    start = offsets[-n]
+    try:
+        with open(path, "rb") as f:
+            f.seek(start)
+            tail = f.read()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(tail)
+        os.replace(tmp, path)
+    except OSError:
+        return offsets
+    return [o - start for o in offsets[-n:]]
+
+def _write_lines(lines):
+    """Append a batch of encoded lines with one open/write and update the index."""
+    global _mission_offsets
+    marker = MISSION_MARKER.encode("utf-8")
+    try:
+        with open(LOG_FILE, "ab") as f:
+            pos = f.tell()
+            f.write(b"".join(lines))
+        # File deleted or truncated behind our back: rebuild the index
+        if _mission_offsets is None or (_mission_offsets and pos < _mission_offsets[-1]):
+            _mission_offsets = _scan_mission_offsets(LOG_FILE)
+        else:
+            for line in lines:
+                if marker in line:
+                    _mission_offsets.append(pos)
+                pos += len(line)
+        if len(_mission_offsets) > LOG_KEEP_MISSIONS:
+            _mission_offsets = _drop_oldest_missions(LOG_FILE, _mission_offsets, LOG_KEEP_MISSIONS)
+    except OSError:
+        pass
+
+
+# --- Background writer ---
+# log() only formats the line and hands it to a bounded queue; a daemon
+# thread collects records for up to LOG_FLUSH_INTERVAL after the first one
+# (or until LOG_BATCH_SIZE of them) and appends each batch in one write.
+# flush_log() cuts the wait short. When the queue is full the record is
+# dropped and counted instead of blocking the caller (Tk thread, monitor thread).
+LOG_QUEUE_SIZE     = 10000
+LOG_BATCH_SIZE     = 500
+LOG_FLUSH_INTERVAL = 0.5  # seconds
+
+_log_queue       = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_dropped_total   = 0  # since start, for get_dropped_log_count()
+_dropped_pending = 0  # not yet reported in the log file
+_writer_thread   = None
+_writer_stop     = threading.Event()
+
+def _writer_loop():
+    global _dropped_pending
+    while True:
+        try:
+            first = _log_queue.get(timeout=LOG_FLUSH_INTERVAL)
+        except queue.Empty:
+            if _writer_stop.is_set():
+                return
+            continue
+
+        batch, waiters = [], []
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+        item = first
+        while True:
+            if isinstance(item, threading.Event):
+                # flush_log() is waiting: write what we have now
+                waiters.append(item)
+                break
+            batch.append(item)
+            if len(batch) >= LOG_BATCH_SIZE:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = _log_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+        with _log_lock:
+            dropped, _dropped_pending = _dropped_pending, 0
+        if dropped:
+            batch.append((time.strftime("[%Y-%m-%d %H:%M:%S] ")
+                          + f"[LOG] Dropped {dropped} log records (queue full)\n").encode("utf-8"))
+        if batch:
+            _write_lines(batch)
+        for event in waiters:
+            event.set()
+
+def _ensure_writer():
+    global _writer_thread
+    if _writer_thread is None or not _writer_thread.is_alive():
+        with _log_lock:
+            if _writer_thread is None or not _writer_thread.is_alive():
+                _writer_stop.clear()
+                _writer_thread = threading.Thread(target=_writer_loop, name="log-writer", daemon=True)
+                _writer_thread.start()
+
+def get_dropped_log_count() -> int:
+    """Records dropped because the queue was full since the program started."""
+    return _dropped_total
+
+def flush_log(timeout: float = 5.0) -> bool:
+    """Block until everything logged so far is on disk (or timeout). Returns True if flushed."""
+    if _writer_thread is None or not _writer_thread.is_alive():
+        return True
+    done = threading.Event()
+    try:
+        _log_queue.put(done, timeout=timeout)
+    except queue.Full:
+        return False
+    return done.wait(timeout)
+
+def shutdown_log(timeout: float = 5.0):
+    """Flush pending records and stop the writer thread."""
+    flush_log(timeout)
+    _writer_stop.set()
+    if _writer_thread is not None:
+        _writer_thread.join(timeout)
+
+atexit.register(shutdown_log)
+
 def log(msg: str):
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(time.strftime("[%Y-%m-%d %H:%M:%S] ") + msg + "\n")
-    trim_log_to_last_n_missions(LOG_FILE, 10)
\ No newline at end of file
+    global _dropped_total, _dropped_pending
+    line = (time.strftime("[%Y-%m-%d %H:%M:%S] ") + msg + "\n").encode("utf-8")
+    _ensure_writer()
+    try:
+        _log_queue.put_nowait(line)
+    except queue.Full:
+        with _log_lock:
+            _dropped_total += 1
+            _dropped_pending += 1
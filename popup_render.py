@@ -1,67 +1,96 @@
 # In ui.py or a new file like popup_render.py
 
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
-from config import RESOURCE_PATH, LOCALE_MAP
+from config import LOCALE_MAP
 from helpers import parse_flexible_date, get_pil_font
 from ranks import get_rank_name
 from logger import log
-from certificates import (
-    generate_certificate_image_DE, generate_certificate_image_US,
-    generate_certificate_image_CCCP, generate_certificate_image_GB
-)
+from certificates import generate_certificate_image
+from image_cache import load_scaled
 import unicodedata
 
-def render_promotion_popup_to_image(ceremony, insignia, rank_title, language,
-                                     country=None, first=None, last=None,
-                                     old_rank_id=None, new_rank_id=None,
-                                     latest_mission_date=None,
-                                     INSIGNIA_BASE=None):
+class PromotionRender:
+    """
+    Everything drawn for one player promotion: rank names, the certificate and
+    the insignia/ceremony images. Built once by prepare_player_promotion and
+    shared by the Tk popup and the PNG export.
+    """
+
+    def __init__(self, ceremony, insignia, rank_title, language, country, name,
+                 old_rank, new_rank, latest_mission_date,
+                 cert_img, ceremony_img, insignia_img):
+        self.ceremony            = ceremony
+        self.insignia            = insignia
+        self.rank_title          = rank_title
+        self.language            = language
+        self.country             = country
+        self.name                = name
+        self.old_rank            = old_rank
+        self.new_rank            = new_rank
+        self.latest_mission_date = latest_mission_date
+        self.cert_img            = cert_img       # full-size certificate (or None)
+        self.ceremony_img        = ceremony_img   # original ceremony image (or None)
+        self.insignia_img        = insignia_img   # insignia scaled 1.3x (or None)
+
+
+def prepare_player_promotion(ceremony, insignia, rank_title, language,
+                             country=None, first=None, last=None,
+                             old_rank_id=None, new_rank_id=None,
+                             latest_mission_date=None,
+                             INSIGNIA_BASE=None):
+    """Look up rank names and render the certificate and images once."""
+    name = f"{first} {last}".strip() if first and last else ""
+    locale = LOCALE_MAP.get(language.upper(), "eng")
+    year = 1941
     try:
-        
-        # --- Setup ---
-        name = f"{first} {last}".strip()
-        locale = LOCALE_MAP.get(language.upper(), "eng")
-        year = 1941
-        try:
-            if latest_mission_date:
-                year = parse_flexible_date(latest_mission_date).year
-        except Exception:
-            pass
-
-        old_rank = get_rank_name(country, old_rank_id, year, INSIGNIA_BASE, locale) if old_rank_id is not None else ""
-        new_rank = get_rank_name(country, new_rank_id, year, INSIGNIA_BASE, locale) if new_rank_id is not None else ""
-
-        # --- Certificate Image Generation ---
-        template_map = {
-            201: "certificate_template.png",
-            103: "Promotion_certificate_US.png",
-            101: "Promotion_certificate_RU.png",
-            102: "Promotion_certificate_GB.png"
-        }
-        cert_img = None
-        if country in template_map:
-            template_path = os.path.join(RESOURCE_PATH, template_map[country])
-            if os.path.exists(template_path):
-                if country == 201:
-                    cert_img = generate_certificate_image_DE(template_path, name, old_rank, new_rank, latest_mission_date)
-                elif country == 103:
-                    cert_img = generate_certificate_image_US(template_path, name, old_rank, new_rank, latest_mission_date)
-                elif country == 101:
-                    cert_img = generate_certificate_image_CCCP(template_path, name, old_rank, new_rank, latest_mission_date)
-                elif country == 102:
-                    cert_img = generate_certificate_image_GB(template_path, name, old_rank, new_rank, latest_mission_date)
-
-        # --- Load Other Images ---
-        ceremony_img = Image.open(ceremony) if os.path.exists(ceremony) else None
-        insignia_img = Image.open(insignia) if os.path.exists(insignia) else None
+        if latest_mission_date:
+            year = parse_flexible_date(latest_mission_date).year
+    except Exception:
+        pass
+
+    old_rank = get_rank_name(country, old_rank_id, year, INSIGNIA_BASE, locale) if old_rank_id is not None else ""
+    new_rank = get_rank_name(country, new_rank_id, year, INSIGNIA_BASE, locale) if new_rank_id is not None else ""
+
+    cert_img = generate_certificate_image(country, name, old_rank, new_rank, latest_mission_date)
+
+    ceremony_img = None
+    if ceremony and os.path.exists(ceremony):
+        ceremony_img = Image.open(ceremony)
+        ceremony_img.load()  # decode now; the image is shared between threads
+    else:
+        log(f"Ceremony missing: {ceremony}")
+    insignia_img = None
+    if insignia and os.path.exists(insignia):
+        insignia_img = load_scaled(insignia, factor=1.3)
+    else:
+        log(f"Insignia missing: {insignia}")
+
+    return PromotionRender(
+        ceremony, insignia, rank_title, language, country, name,
+        old_rank, new_rank, latest_mission_date,
+        cert_img, ceremony_img, insignia_img
+    )
+
+
+def render_promotion_popup_to_image(render):
+    """Compose a prepared PromotionRender into one PNG next to the certificates."""
+    try:
+        language = render.language
+        country = render.country
+        name = render.name
+        new_rank = render.new_rank
+        latest_mission_date = render.latest_mission_date
+        cert_img = render.cert_img
+        ceremony_img = render.ceremony_img
+        insignia_img = render.insignia_img
 
         # --- Scaling ---
         cert_img = cert_img.resize((int(cert_img.width * 0.9), int(cert_img.height * 0.9)), Image.LANCZOS)
-        if insignia_img:
-            insignia_img = insignia_img.resize((int(insignia_img.width * 1.3), int(insignia_img.height * 1.3)), Image.LANCZOS)
         if ceremony_img:
-            ceremony_img = ceremony_img.resize((cert_img.height, cert_img.height), Image.LANCZOS)
+            ceremony_img = load_scaled(render.ceremony, size=(cert_img.height, cert_img.height))
 
         # --- Layout Sizes ---
         gap = 20
@@ -129,3 +158,63 @@ def render_promotion_popup_to_image(ceremony, insignia, rank_title, language,
 
     except Exception as e:
         log(f"[ERROR] Failed to render popup image: {e}")
+
+
+def save_certificate(render):
+    """Save the bare certificate PNG next to the full popup image."""
+    if not render.cert_img:
+        return
+    filename = (f"promotion_certificate_{render.country}_{render.name.replace(' ', '_')}_"
+                f"{render.new_rank}_{render.latest_mission_date}.png")
+    try:
+        render.cert_img.save(filename)
+        log(f"Certificate saved to {filename}")
+    except Exception as e:
+        log(f"Failed to save certificate: {e}")
+
+
+# --- Pre-rendering ---
+class PrerenderQueue:
+    """
+    Stands in for popup_queue on the monitor side. Player promotions are
+    prepared on a worker thread and only the finished
+    ("player_rendered", PromotionRender) item reaches `target`, so the Tk
+    thread just wraps the images in PhotoImage. The PNG files are written
+    after the popup has been handed over. Other items pass straight through.
+    """
+
+    def __init__(self, target, insignia_base, workers=1):
+        self.target = target
+        self.insignia_base = insignia_base
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="popup-render")
+
+    def put(self, note):
+        if note[0] != "player":
+            self.target.put(note)
+            return
+        self._executor.submit(self._render, note)
+
+    def _render(self, note):
+        (
+            _, ceremony, insignia, rank_title, language,
+            country, first, last, old_rank_id, new_rank_id, latest_mission_date
+        ) = note
+        try:
+            t0 = time.perf_counter()
+            render = prepare_player_promotion(
+                ceremony, insignia, rank_title, language,
+                country=country, first=first, last=last,
+                old_rank_id=old_rank_id, new_rank_id=new_rank_id,
+                latest_mission_date=latest_mission_date,
+                INSIGNIA_BASE=self.insignia_base
+            )
+            log(f"Pre-rendered player promotion in {time.perf_counter() - t0:.2f}s")
+        except Exception as e:
+            # Let the UI render it the slow way rather than lose the popup
+            log(f"[ERROR] Failed to pre-render player promotion: {e}")
+            self.target.put(note)
+            return
+        # Show the popup first; the exports only read the prepared images
+        self.target.put(("player_rendered", render))
+        save_certificate(render)
+        render_promotion_popup_to_image(render)
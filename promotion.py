@@ -6,20 +6,117 @@ from datetime import datetime
 from ranks import get_rank_name, get_rank_title_path, get_small_insignia_path
 from logger import log
 from helpers import is_il2_running, parse_flexible_date, migrate_player_stats_by_description_if_needed
-from config import POLL_INTERVAL, LOCALE_MAP, CEREMONY_MAP, RESOURCE_PATH, load_config
-from helpers import cleanup_orphaned_promotion_attempts
+from helpers import forget_migrated_pilots
+from config import POLL_INTERVAL, ORPHAN_CLEANUP_INTERVAL, LOCALE_MAP, CEREMONY_MAP, RESOURCE_PATH, load_config
+from helpers import cleanup_orphaned_promotion_attempts, PilotDescriptionIndex
+from state_db import open_career_db, get_last_processed_mission, set_last_processed_mission
+from eligibility import parse_pilot_stats, eligible_mask
+
+# Where notifications go; the entry point replaces this with the UI queue
+popup_queue = queue.Queue()
 
 config_data = load_config()
 PROMOTION_COOLDOWN_DAYS = config_data["PROMOTION_COOLDOWN_DAYS"]
 PROMOTION_FAIL_THRESHOLD = config_data["PROMOTION_FAIL_THRESHOLD"]
-
-def insert_promotion_event(conn: sqlite3.Connection, pilot_id: int, new_rank: int, mission_date: str) -> bool:
+# One popup listing every AI promotion of a mission instead of one per pilot
+AI_PROMOTION_DIGEST = config_data["AI_PROMOTION_DIGEST"]
+
+def apply_config(cfg):
+    """Switch the module-level promotion settings to `cfg` (a load_config() result)."""
+    global config_data, PROMOTION_COOLDOWN_DAYS, PROMOTION_FAIL_THRESHOLD, AI_PROMOTION_DIGEST
+    config_data = cfg
+    PROMOTION_COOLDOWN_DAYS = cfg["PROMOTION_COOLDOWN_DAYS"]
+    PROMOTION_FAIL_THRESHOLD = cfg["PROMOTION_FAIL_THRESHOLD"]
+    AI_PROMOTION_DIGEST = cfg["AI_PROMOTION_DIGEST"]
+
+_RANK_UPDATE_SQL = "UPDATE pilot SET rankId=? WHERE id=?"
+
+_ATTEMPT_UPSERT_SQL = """
+    INSERT INTO rankmod.promotion_attempts (pilotId, last_attempt, last_success, fail_count)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(pilotId) DO UPDATE SET last_attempt=excluded.last_attempt,
+                                       last_success=excluded.last_success,
+                                       fail_count=excluded.fail_count
+"""
+
+_EVENT_INSERT_SQL = """
+    INSERT INTO event(
+        date, type, pilotId, rankId, missionId,
+        squadronId, careerId,
+        ipar1, ipar2, ipar3, ipar4,
+        tpar1, tpar2, tpar3, tpar4,
+        isDeleted
+    ) VALUES (?, 6, ?, ?, -1,
+              ?, ?,
+              ?, -1, -1, -1,
+              ?, '', '', '',
+              0)
+"""
+
+class PromotionBatch:
     """
-    Insert a type=6 promotion event into cp.db.
-    Returns True if inserted, False if a duplicate already existed.
+    Collects the writes of a promotion pass (rank updates, promotion_attempts
+    upserts and type=6 events) and applies them with executemany in a single
+    transaction, so a mission costs one commit on cp.db instead of several per
+    promoted pilot.
     """
-    cur = conn.cursor()
 
+    def __init__(self):
+        self.rank_updates = []   # (rankId, pilotId)
+        self.attempts     = []   # (pilotId, last_attempt, last_success, fail_count)
+        self.events       = []   # _EVENT_INSERT_SQL params
+        self._event_keys  = set()
+
+    def __len__(self):
+        return len(self.rank_updates) + len(self.attempts) + len(self.events)
+
+    def update_rank(self, pilot_id, new_rank):
+        self.rank_updates.append((new_rank, pilot_id))
+
+    def record_attempt(self, pilot_id, attempt_date, success, fail_count):
+        self.attempts.append((pilot_id, attempt_date, 1 if success else 0, fail_count))
+
+    def add_event(self, params) -> bool:
+        """Queue an event row; returns False if the same event is already queued."""
+        promo_date, pilot_id, new_rank = params[0], params[1], params[2]
+        key = (pilot_id, new_rank, promo_date)
+        if key in self._event_keys:
+            return False
+        self._event_keys.add(key)
+        self.events.append(params)
+        return True
+
+    def flush(self, conn: sqlite3.Connection, commit=True):
+        """
+        Apply all queued writes in one transaction and empty the batch.
+        commit=False leaves the transaction open for the caller to commit.
+        """
+        if not len(self):
+            return
+        try:
+            cur = conn.cursor()
+            cur.executemany(_RANK_UPDATE_SQL, self.rank_updates)
+            cur.executemany(_ATTEMPT_UPSERT_SQL, self.attempts)
+            cur.executemany(_EVENT_INSERT_SQL, self.events)
+            if commit:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        log(f"[BATCH] {'Committed' if commit else 'Wrote'} {len(self.rank_updates)} rank updates, "
+            f"{len(self.attempts)} attempt records, {len(self.events)} events")
+        self.rank_updates.clear()
+        self.attempts.clear()
+        self.events.clear()
+        self._event_keys.clear()
+
+
+def _build_promotion_event(cur, pilot_id: int, new_rank: int, mission_date: str):
+    """
+    Resolve everything needed for a type=6 promotion event.
+    Returns the _EVENT_INSERT_SQL params, or None if the pilot is missing or
+    the event already exists in cp.db.
+    """
     # --- Get pilot info ---
     prow = cur.execute("""
         SELECT name, lastName, squadronId, personageId
@@ -27,7 +124,7 @@ def insert_promotion_event(conn: sqlite3.Connection, pilot_id: int, new_rank: in
     """, (pilot_id,)).fetchone()
     if not prow:
         log(f"[WARN] Pilot {pilot_id} not found for event insert")
-        return False
+        return None
 
     name, last_name, pilot_squadron_row_id, personage_id = prow
     full_name = f"{name} {last_name}".strip()
@@ -73,30 +170,38 @@ def insert_promotion_event(conn: sqlite3.Connection, pilot_id: int, new_rank: in
     """, (pilot_id, new_rank, promo_date)).fetchone()
     if exists:
         log(f"[SKIP] Duplicate promotion event for pilot {pilot_id} rank {new_rank} date {promo_date}")
-        return False
+        return None
 
-    # --- Insert promotion event ---
-    cur.execute("""
-        INSERT INTO event(
-            date, type, pilotId, rankId, missionId,
-            squadronId, careerId,
-            ipar1, ipar2, ipar3, ipar4,
-            tpar1, tpar2, tpar3, tpar4,
-            isDeleted
-        ) VALUES (?, 6, ?, ?, -1,
-                  ?, ?,
-                  ?, -1, -1, -1,
-                  ?, '', '', '',
-                  0)
-    """, (
+    return (
         promo_date,
         pilot_id, new_rank,
         event_squadron_id, career_id,
         new_rank,
         full_name
-    ))
+    )
+
+
+def insert_promotion_event(conn: sqlite3.Connection, pilot_id: int, new_rank: int, mission_date: str,
+                           batch: PromotionBatch = None) -> bool:
+    """
+    Insert a type=6 promotion event into cp.db.
+    With a batch, the row is only queued and written by batch.flush().
+    Returns True if inserted, False if a duplicate already existed.
+    """
+    params = _build_promotion_event(conn.cursor(), pilot_id, new_rank, mission_date)
+    if params is None:
+        return False
+
+    if batch is not None:
+        if not batch.add_event(params):
+            log(f"[SKIP] Promotion event for pilot {pilot_id} rank {new_rank} already queued")
+            return False
+        log(f"[EVENT] Queued type=6 for pilot {pilot_id} → rank {new_rank} on {params[0]}")
+        return True
+
+    conn.execute(_EVENT_INSERT_SQL, params)
     conn.commit()
-    log(f"[EVENT] Inserted type=6 for pilot {pilot_id} → rank {new_rank} on {promo_date}")
+    log(f"[EVENT] Inserted type=6 for pilot {pilot_id} → rank {new_rank} on {params[0]}")
     return True
 
 
@@ -105,8 +210,42 @@ def get_latest_event_year(conn, pid: int) -> int:
     cur = conn.cursor()
     cur.execute("SELECT date FROM event WHERE pilotId=? ORDER BY date DESC LIMIT 1", (pid,))
     row = cur.fetchone()
-    return int(row[0][:4]) if row else 1941# --- Check all pilots (per-country ceilings + debug logging) --------------
-    
+    return int(row[0][:4]) if row else 1941
+
+def get_latest_event_years(conn, pids) -> dict:
+    """
+    get_latest_event_year for many pilots with one grouped query per 500 ids.
+    Returns {pilotId: year}, 1941 for pilots without events.
+    """
+    pids = list(dict.fromkeys(pids))
+    years = {}
+    for i in range(0, len(pids), 500):
+        chunk = pids[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        for pid, latest in conn.execute(
+            f"SELECT pilotId, MAX(date) FROM event WHERE pilotId IN ({marks}) GROUP BY pilotId",
+            chunk
+        ).fetchall():
+            if latest:
+                years[pid] = int(latest[:4])
+    return {pid: years.get(pid, 1941) for pid in pids}
+
+# --- Pilot descriptions ---
+# Parsed 'key=value&...' descriptions, refreshed for new or changed pilots only
+pilot_descriptions = PilotDescriptionIndex()
+
+# --- Pilot change detection ---
+# pilotId -> (rankId, pcp, sorties, goodSorties, rank ceiling) as seen at the
+# last evaluation. Pilots whose row still matches are skipped by
+# check_all_pilots: the AI threshold decision depends only on these values.
+_pilot_snapshot = {}
+
+def reset_pilot_snapshot():
+    """Forget all snapshots so the next check_all_pilots evaluates every pilot."""
+    _pilot_snapshot.clear()
+
+# --- Check all pilots (per-country ceilings + debug logging) --------------
+
 def check_all_pilots(
     conn,
     thresholds,
@@ -116,22 +255,40 @@ def check_all_pilots(
     campaign_country,
     mission_squadron,
     squadron_country_map,
-    last_date
+    last_date,
+    force_full_scan=False,
+    latest_mission_id=None,
+    sink=None,
+    commit=True,
+    pilot_ids=None
 ):
     """
     Promotions now obey per-country ceilings:
       - squadron_country_map: { squadronId: countryCode, ... }
       - max_ranks:            { "101": 10, "102":13, ... }
+
+    Only pilots whose rank/pcp/sorties/goodSorties/ceiling changed since the
+    last evaluation are re-checked (the active player always is, because of the
+    chance roll and cooldown). force_full_scan=True re-checks everybody.
+
+    Notifications go to `sink` (default: popup_queue). commit=False leaves the
+    pass's writes uncommitted. pilot_ids limits the pass to those pilots (and
+    the active player) when the caller knows nobody else changed.
+    Returns [(pilotId, old rank, new rank, is_player), ...].
     """
+    if sink is None:
+        sink = popup_queue
     ai_notifications = []
     player_notify    = None
+    promoted         = []
+    batch = PromotionBatch()
     cur = conn.cursor()
 
     # NEW: Find active player for this campaign/squadron
-    active_player_id = get_active_player_id(conn, mission_squadron)
+    active_player_id = get_active_player_id(conn, mission_squadron, latest_mission_id)
 
-    # fetch all pilots
-    cur.execute("""
+    # fetch all pilots (or only pilot_ids plus the active player)
+    pilot_query = """
         SELECT
             id,
             name,
@@ -144,94 +301,143 @@ def check_all_pilots(
             personageId,
             squadronId
           FROM pilot
-    """)
+    """
+    if force_full_scan:
+        reset_pilot_snapshot()
+    if pilot_ids is None or force_full_scan:
+        rows = cur.execute(pilot_query).fetchall()
+    else:
+        ids = sorted(set(pilot_ids) | ({active_player_id} if active_player_id else set()))
+        rows = []
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows += cur.execute(
+                f"{pilot_query} WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+    # Pilots to evaluate this pass: (row fields..., parsed stats, ceiling, snapshot state)
+    candidates = []
+    evaluated_states = {}  # pilotId -> state, applied to the snapshot after the flush
     for (
         pid, first, last, raw_rank, raw_pcp,
         raw_sorties, raw_good, desc, person, pilot_sq
-    ) in cur.fetchall():
+    ) in rows:
         is_player = (pid == active_player_id)
-        # Parse numeric fields up‐front
-        try:
-            r = int(raw_rank)
-        except:
-            r = 0
-        try:
-            p = float(raw_pcp)
-        except:
-            p = 0.0
-        s = int(raw_sorties)
-        g = int(raw_good)
-
+        # Keeps the index current for pilots whose description changed
+        parsed_desc = pilot_descriptions.update(pid, desc, person)
         # Determine this pilot’s ceiling
         pilot_country = squadron_country_map.get(pilot_sq, campaign_country)
         ceiling       = max_ranks.get(str(pilot_country), 5)
 
-        log(f"Pilot {pid}: squadron={pilot_sq}, "
-            f"country={pilot_country}, current_rank={r}, "
-            f"max_allowed_rank={ceiling}")
-
-        # Try to promote if in [5 .. ceiling-1]
-        if 4 <= r < ceiling:
-            nr = try_promote(conn, pid, r, p, s, g, thresholds, last_date, is_player=is_player)
+        state = (raw_rank, raw_pcp, raw_sorties, raw_good, ceiling)
+        if not is_player and _pilot_snapshot.get(pid) == state:
+            continue
+        r, p, s, g = parse_pilot_stats(raw_rank, raw_pcp, raw_sorties, raw_good)
+        candidates.append((pid, first, last, parsed_desc, pilot_country, pilot_sq,
+                           is_player, r, p, s, g, ceiling, state))
+
+    # Threshold screening for all candidates in one pass
+    eligible = eligible_mask(
+        [c[7] for c in candidates], [c[8] for c in candidates],
+        [c[9] for c in candidates], [c[10] for c in candidates],
+        [c[11] for c in candidates], thresholds
+    )
+    for (
+        pid, first, last, parsed_desc, pilot_country, pilot_sq,
+        is_player, r, p, s, g, ceiling, state
+    ), ok in zip(candidates, eligible):
+        if ok:
+            log(f"Pilot {pid}: squadron={pilot_sq}, "
+                f"country={pilot_country}, current_rank={r}, "
+                f"max_allowed_rank={ceiling}")
+            nr = try_promote(conn, pid, r, p, s, g, thresholds, last_date,
+                             is_player=is_player, batch=batch)
         else:
             nr = r
+        # A promotion writes a new rankId, so the pilot is re-checked next time
+        evaluated_states[pid] = state
 
         if nr != r:
-            # Player pilot check: must match active_player_id!
-            if is_player:
-                log(f"Treating pilot {pid} as active player for this mission.")
-                # real player for this campaign
-                if "birthCountryInfo=" in desc:
-                    try:
-                        display_country = int(desc.split("birthCountryInfo=")[1].split("&")[0])
-                    except:
-                        display_country = pilot_country
-                else:
-                    display_country = pilot_country
-
-                year = get_latest_event_year(conn, pid) if display_country == 101 else 1941
-                big_ins, title = get_rank_title_path(
-                    display_country, nr, year, insignia_base, LOCALE_MAP[language]
-                )
-                ceremony = os.path.join(
-                    RESOURCE_PATH,
-                    CEREMONY_MAP.get(display_country, "")
-                )
-                player_notify = (
-                    "player", ceremony, big_ins, title, language,
-                    display_country, first, last, r, nr, last_date  
-                )
+            promoted.append((pid, first, last, parsed_desc, pilot_country, pilot_sq, is_player, r, nr))
+
+    # All rank updates, attempt records and events of this pass in one transaction
+    batch.flush(conn, commit=commit)
+    # Only now count these pilots as evaluated: if the flush failed (e.g. the
+    # game holds the write lock) they must be looked at again next pass
+    _pilot_snapshot.update(evaluated_states)
+
+    # Pick the country each promotion is shown for
+    notices = []
+    for pid, first, last, parsed_desc, pilot_country, pilot_sq, is_player, r, nr in promoted:
+        if is_player:
+            # real player for this campaign
+            try:
+                display_country = int(parsed_desc["birthCountryInfo"])
+            except (KeyError, ValueError):
+                display_country = pilot_country
+        elif pilot_sq == mission_squadron:
+            display_country = pilot_country
+        else:
+            continue  # AI in other squadrons: silent
+        notices.append((pid, first, last, display_country, is_player, r, nr))
 
+    # Soviet insignia depend on the latest event year: one query for all pilots
+    event_years = get_latest_event_years(
+        conn, [n[0] for n in notices if n[3] == 101]
+    )
 
-            # AI pilot (not the player)
-            else:
-                display_country = pilot_country
-                year = get_latest_event_year(conn, pid) if display_country == 101 else 1941
-
-                if pilot_sq == mission_squadron:
-                    full_name = f"{first} {last}".strip()
-                    before_ins = get_small_insignia_path(
-                        display_country, nr - 1, year, insignia_base
-                    )
-                    after_ins  = get_small_insignia_path(
-                        display_country, nr, year, insignia_base
-                    )
-                    _, title = get_rank_title_path(
-                        display_country, nr, year,
-                        insignia_base,
-                        LOCALE_MAP[language]
-                    )
-                    ai_notifications.append(
-                        ("ai", full_name, before_ins, after_ins, title, language)
-                    )
-                # AI in other squadrons: silent
+    for pid, first, last, display_country, is_player, r, nr in notices:
+        year = event_years.get(pid, 1941)
+        # Player pilot check: must match active_player_id!
+        if is_player:
+            log(f"Treating pilot {pid} as active player for this mission.")
+            big_ins, title = get_rank_title_path(
+                display_country, nr, year, insignia_base, LOCALE_MAP[language]
+            )
+            ceremony = os.path.join(
+                RESOURCE_PATH,
+                CEREMONY_MAP.get(display_country, "")
+            )
+            player_notify = (
+                "player", ceremony, big_ins, title, language,
+                display_country, first, last, r, nr, last_date  
+            )
+
+        # AI pilot (not the player) in the mission squadron
+        else:
+            full_name = f"{first} {last}".strip()
+            before_ins = get_small_insignia_path(
+                display_country, nr - 1, year, insignia_base
+            )
+            after_ins  = get_small_insignia_path(
+                display_country, nr, year, insignia_base
+            )
+            _, title = get_rank_title_path(
+                display_country, nr, year,
+                insignia_base,
+                LOCALE_MAP[language]
+            )
+            ai_notifications.append(
+                ("ai", full_name, before_ins, after_ins, title, language)
+            )
+
+    log(f"Evaluated {len(candidates)} of {len(rows)} pilots, {sum(eligible)} eligible "
+        f"({'full scan' if force_full_scan else 'changed only'})")
 
     # enqueue AI first, then the player
-    for note in ai_notifications:
-        popup_queue.put(note)
+    if AI_PROMOTION_DIGEST and ai_notifications:
+        sink.put((
+            "ai_digest",
+            [(name, before, after, title) for _, name, before, after, title, _ in ai_notifications],
+            language
+        ))
+    else:
+        for note in ai_notifications:
+            sink.put(note)
     if player_notify:
         log(f"Enqueuing player promotion notification for pilot {active_player_id}")
-        popup_queue.put(player_notify)
+        sink.put(player_notify)
+
+    return [(pid, r, nr, is_player) for pid, _, _, _, _, _, is_player, r, nr in promoted]
         
 # --- Promotion logic ---
 #def try_promote(conn, pid, rank, pcp, sorties, good, thresholds):
@@ -250,10 +456,19 @@ def check_all_pilots(
 #        return nr
 #    return rank
 
-def try_promote(conn, pid, rank, pcp, sorties, good, thresholds, current_date_str, is_player=True):
+def try_promote(conn, pid, rank, pcp, sorties, good, thresholds, current_date_str, is_player=True,
+                batch=None):
+    """
+    Writes go into `batch` when given (flushed by the caller); otherwise they
+    are committed before returning.
+    """
     from datetime import datetime
     import random
 
+    own_batch = batch is None
+    if own_batch:
+        batch = PromotionBatch()
+
     p = float(pcp)
     s = int(sorties)
     g = int(good)
@@ -273,17 +488,18 @@ def try_promote(conn, pid, rank, pcp, sorties, good, thresholds, current_date_st
     # === AI PILOT LOGIC ===
     if not is_player:
         promote_to = rank + 1
-        conn.execute("UPDATE pilot SET rankId=? WHERE id=?", (promote_to, pid))
-        conn.commit()
+        batch.update_rank(pid, promote_to)
         log(f"[AI] Pilot {pid} promoted to rank {promote_to} (auto)")
-        insert_promotion_event(conn, pid, promote_to, current_date_str)
+        insert_promotion_event(conn, pid, promote_to, current_date_str, batch=batch)
+        if own_batch:
+            batch.flush(conn)
         return promote_to
 
     # === PLAYER PILOT LOGIC ===
     cur = conn.cursor()
     cur.execute("""
         SELECT last_attempt, last_success, fail_count
-        FROM promotion_attempts
+        FROM rankmod.promotion_attempts
         WHERE pilotId = ?
     """, (pid,))
     row = cur.fetchone()
@@ -317,17 +533,12 @@ def try_promote(conn, pid, rank, pcp, sorties, good, thresholds, current_date_st
     # Forced promotion after 3 failed attempts
     if fail_count >= PROMOTION_FAIL_THRESHOLD:
         promote_to = rank + 1
-        conn.execute("UPDATE pilot SET rankId=? WHERE id=?", (promote_to, pid))
-        cur.execute("""
-            INSERT INTO promotion_attempts (pilotId, last_attempt, last_success, fail_count)
-            VALUES (?, ?, 1, 0)
-            ON CONFLICT(pilotId) DO UPDATE SET last_attempt=excluded.last_attempt,
-                                               last_success=1,
-                                               fail_count=0
-        """, (pid, current_date_str))
-        conn.commit()
+        batch.update_rank(pid, promote_to)
+        batch.record_attempt(pid, current_date_str, True, 0)
         log(f"[PLAYER] Pilot {pid} forced promotion to {promote_to} after {fail_count} failures.")
-        insert_promotion_event(conn, pid, promote_to, current_date_str)
+        insert_promotion_event(conn, pid, promote_to, current_date_str, batch=batch)
+        if own_batch:
+            batch.flush(conn)
         return promote_to
 
     # Chance-based promotion
@@ -337,168 +548,381 @@ def try_promote(conn, pid, rank, pcp, sorties, good, thresholds, current_date_st
 
     if roll <= chance:
         promote_to = rank + 1
-        conn.execute("UPDATE pilot SET rankId=? WHERE id=?", (promote_to, pid))
-        cur.execute("""
-            INSERT INTO promotion_attempts (pilotId, last_attempt, last_success, fail_count)
-            VALUES (?, ?, 1, 0)
-            ON CONFLICT(pilotId) DO UPDATE SET last_attempt=excluded.last_attempt,
-                                               last_success=1,
-                                               fail_count=0
-        """, (pid, current_date_str))
-        conn.commit()
+        batch.update_rank(pid, promote_to)
+        batch.record_attempt(pid, current_date_str, True, 0)
         log(f"[PLAYER] Pilot {pid} promoted to rank {promote_to}")
-        insert_promotion_event(conn, pid, promote_to, current_date_str)
+        insert_promotion_event(conn, pid, promote_to, current_date_str, batch=batch)
+        if own_batch:
+            batch.flush(conn)
         return promote_to
     else:
         fail_count += 1
-        cur.execute("""
-            INSERT INTO promotion_attempts (pilotId, last_attempt, last_success, fail_count)
-            VALUES (?, ?, 0, ?)
-            ON CONFLICT(pilotId) DO UPDATE SET last_attempt=excluded.last_attempt,
-                                               last_success=0,
-                                               fail_count=excluded.fail_count
-        """, (pid, current_date_str, fail_count))
-        conn.commit()
+        batch.record_attempt(pid, current_date_str, False, fail_count)
         log(f"[PLAYER] Pilot {pid} failed promotion. Fail count now {fail_count}")
+        if own_batch:
+            batch.flush(conn)
         return rank
 
 
     
-def get_active_player_id(conn, mission_squadron):
+# (squadronId, latest mission id) -> active player id (or None)
+_active_player_memo = {}
+
+def get_active_player_id(conn, mission_squadron, latest_mission_id=None):
     """
     Returns the id of the *real player* pilot in the current mission's squadron,
     preferring the one with most recent mission activity.
     Logs candidates and selected id for debug.
+
+    Resolved with one query and memoized per (squadron, latest mission id);
+    callers that already know the squadron's latest mission id pass it to get
+    the memoized answer without touching the database.
     """
+    key = (mission_squadron, latest_mission_id)
+    if latest_mission_id is not None and key in _active_player_memo:
+        return _active_player_memo[key]
+
     cur = conn.cursor()
-    # Find all possible player pilots in this squadron
+    # All possible player pilots in this squadron, flagged if they have an
+    # event in the squadron's latest mission; best candidate first
     cur.execute("""
-        SELECT id FROM pilot
-        WHERE personageId <> '' AND squadronId = ?
-    """, (mission_squadron,))
-    candidates = [row[0] for row in cur.fetchall()]
+        SELECT p.id,
+               m.id,
+               EXISTS (
+                   SELECT 1 FROM event e
+                   WHERE e.pilotId = p.id AND e.missionId = m.id
+               ) AS flew_latest
+          FROM pilot p
+          LEFT JOIN (
+               SELECT MAX(id) AS id FROM mission WHERE squadronId = ?
+          ) m
+         WHERE p.personageId <> '' AND p.squadronId = ?
+         ORDER BY flew_latest DESC, p.id DESC
+    """, (mission_squadron, mission_squadron))
+    rows = cur.fetchall()
+    candidates = sorted(row[0] for row in rows)
     log(f"Possible player candidates in squadron {mission_squadron}: {candidates}")
 
-    if not candidates:
+    if not rows:
         log("No active player found for this squadron.")
-        return None
-
-    # Get the latest mission for this squadron
-    cur.execute("""
-        SELECT id FROM mission
-        WHERE squadronId = ?
-        ORDER BY id DESC
-        LIMIT 1
-    """, (mission_squadron,))
-    mission_row = cur.fetchone()
-    latest_mission_id = mission_row[0] if mission_row else None
-
-    # Prefer the candidate who has an event in the latest mission
-    if latest_mission_id:
-        for pid in sorted(candidates, reverse=True):  # Prefer higher id if multiple
-            cur.execute("""
-                SELECT 1 FROM event WHERE pilotId = ? AND missionId = ? LIMIT 1
-            """, (pid, latest_mission_id))
-            if cur.fetchone():
-                log(f"Selected active player id: {pid} (has event in latest mission {latest_mission_id})")
-                return pid
-
-    # Fallback: highest id as before
-    selected_pid = max(candidates)
-    log(f"Selected active player id: {selected_pid} (fallback to highest id)")
+        selected_pid = None
+        if latest_mission_id is not None:
+            _active_player_memo[key] = None
+        return selected_pid
+
+    selected_pid, resolved_mission_id, flew_latest = rows[0]
+    if flew_latest:
+        log(f"Selected active player id: {selected_pid} (has event in latest mission {resolved_mission_id})")
+    else:
+        # Fallback: highest id as before
+        log(f"Selected active player id: {selected_pid} (fallback to highest id)")
+    _active_player_memo[(mission_squadron, resolved_mission_id)] = selected_pid
     return selected_pid
 
-# --- Monitor DB ---
-def monitor_db(db_path, thresholds, max_ranks, language, insignia_base):
-    conn = sqlite3.connect(db_path)
-    cur  = conn.cursor()
-
-    # 1) Build a full squadron→country map up front
-    cur.execute("SELECT id, configID FROM squadron")
-    squadron_country = { row[0]: row[1] // 1000 for row in cur.fetchall() }
-    
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS promotion_attempts (
-        pilotId INTEGER PRIMARY KEY,
-        last_attempt TEXT,
-        last_success INTEGER,
-        fail_count INTEGER DEFAULT 0
+# --- Squadron → country map ---
+# Cached together with (row count, max id) of the squadron table and only
+# rebuilt when that signature changes.
+_squadron_country_cache = {"signature": None, "map": {}}
+
+def get_squadron_country_map(conn) -> dict:
+    """{ squadronId: countryCode } for every squadron in the career."""
+    signature = tuple(conn.execute("SELECT COUNT(*), MAX(id) FROM squadron").fetchall()[0])
+    if signature != _squadron_country_cache["signature"]:
+        _squadron_country_cache["map"] = {
+            row[0]: row[1] // 1000
+            for row in conn.execute("SELECT id, configID FROM squadron").fetchall()
+        }
+        _squadron_country_cache["signature"] = signature
+        log(f"Rebuilt squadron→country map ({signature[0]} squadrons)")
+    return _squadron_country_cache["map"]
+
+# --- Orphan cleanup scheduling ---
+# promotion_attempts rows only become orphans when pilots are deleted, so the
+# anti-join cleanup runs when the pilot table shrank (count vs. ids added since
+# the last check) or every ORPHAN_CLEANUP_INTERVAL passes as a backstop.
+_orphan_cleanup_state = {"signature": None, "passes": 0}
+
+def orphan_cleanup_reason(conn):
+    """Why the orphan cleanup should run after this pass, or None to skip it."""
+    state = _orphan_cleanup_state
+    previous = state["signature"]
+    prev_max = previous[1] if previous else 0
+    count, max_id, added = conn.execute(
+        "SELECT COUNT(*), MAX(id), COUNT(CASE WHEN id > ? THEN 1 END) FROM pilot",
+        (prev_max or 0,)
+    ).fetchall()[0]
+    state["signature"] = (count, max_id)
+    state["passes"] += 1
+
+    if previous is None:
+        reason = "startup"
+    elif count < previous[0] + added:
+        reason = f"{previous[0] + added - count} pilots deleted"
+    elif state["passes"] >= ORPHAN_CLEANUP_INTERVAL:
+        reason = "scheduled"
+    else:
+        return None
+    state["passes"] = 0
+    return reason
+
+def reset_career_caches():
+    """Forget everything cached about the career before (re)starting on a cp.db."""
+    _squadron_country_cache["signature"] = None
+    _active_player_memo.clear()
+    pilot_descriptions.clear()
+    _orphan_cleanup_state.update(signature=None, passes=0)
+    reset_pilot_snapshot()
+
+# --- Promotion pass for one mission date ---
+def evaluate_mission_date(
+    conn,
+    thresholds,
+    max_ranks,
+    language,
+    insignia_base,
+    squadron_id,
+    squadron_country,
+    mission_date,
+    latest_mission_id=None,
+    force_full_scan=False,
+    sink=None,
+    commit=True,
+    pilot_ids=None
+):
+    """
+    Everything done when the first mission of a new date shows up: player
+    stats migration, campaign country, then check_all_pilots.
+    Returns check_all_pilots' promotions.
+    """
+    # ✅ migrate player stats ONCE for a new player row (if applicable)
+    if squadron_id is not None:
+        active_player_id = get_active_player_id(conn, squadron_id, latest_mission_id)
+        if active_player_id:
+            if migrate_player_stats_by_description_if_needed(conn, active_player_id, commit=commit):
+                pilot_ids = None  # the player row changed under us: look at everyone
+    # 2) Determine this mission’s “player” country from the
+    #    description index (new pilots are parsed on refresh)
+    campaign_country = 201
+    if squadron_id is not None:
+        pilot_descriptions.refresh(conn)
+        campaign_country = pilot_descriptions.campaign_country(
+            squadron_id, campaign_country
+        )
+
+    # 3) Call promotions, passing the full map
+    return check_all_pilots(
+        conn,
+        thresholds,
+        max_ranks,
+        language,
+        insignia_base,
+        campaign_country,
+        squadron_id,
+        squadron_country,
+        mission_date,
+        force_full_scan=force_full_scan,
+        latest_mission_id=latest_mission_id,
+        sink=sink,
+        commit=commit,
+        pilot_ids=pilot_ids
     )
-""")
 
-    # Prime with last seen mission
-    cur.execute("SELECT id, date FROM mission ORDER BY id DESC LIMIT 1")
-    row = cur.fetchone()
-    last_mid, last_date = (row[0], row[1]) if row else (0, None)
-    conn.close()
-    log(f"Starting mission monitor from id {last_mid}, date {last_date}")
+# --- Catch-up over the whole career ---
+def catch_up_career(db_path, thresholds, max_ranks, language, insignia_base,
+                    sink=None, from_mission=None):
+    """
+    Replay every mission after `from_mission` in date order, one promotion
+    pass per mission date, without IL-2 or the UI. By default it starts after
+    the last mission the monitor or a previous catch-up processed (kept in
+    rankmod.mission_progress), so running it twice does not promote again.
+
+    The replay uses the pilots' CURRENT stats (cp.db keeps no history of pcp or
+    sorties); promotion events are dated at the replayed mission dates.
+
+    The first pass reads the whole pilot table; after that only our own writes
+    change it, so each pass re-reads just the pilots the previous one promoted
+    (plus the player). All writes, including the new progress mark, go out in
+    a single commit at the end.
+    Returns (promotions, passes, elapsed seconds).
+    """
+    started = time.perf_counter()
+    reset_career_caches()
+    conn = open_career_db(db_path)
+    promotions = []
+    passes = 0
+    try:
+        if from_mission is None:
+            from_mission = get_last_processed_mission(conn)
+        missions = conn.execute(
+            "SELECT id, date, squadronId FROM mission WHERE id>? ORDER BY date, id",
+            (from_mission,)
+        ).fetchall()
+        squadron_country = get_squadron_country_map(conn)
+        latest_by_squadron = {}
+        for mid, _, squadron_id in missions:
+            latest_by_squadron[squadron_id] = max(mid, latest_by_squadron.get(squadron_id, mid))
+        log(f"[CATCHUP] Replaying {len(missions)} missions after id {from_mission} from {db_path}")
+
+        last_date = None
+        changed = None  # pilots promoted by the previous pass; None = everyone
+        last_squadron = None
+        for mid, date_str, squadron_id in missions:
+            if date_str == last_date:
+                continue
+            last_date = date_str
+            if squadron_id != last_squadron:
+                # other campaign country / active player: ceilings may differ
+                changed, last_squadron = None, squadron_id
+            promoted = evaluate_mission_date(
+                conn, thresholds, max_ranks, language, insignia_base,
+                squadron_id, squadron_country, date_str,
+                latest_mission_id=latest_by_squadron.get(squadron_id),
+                force_full_scan=(passes == 0),
+                sink=sink,
+                commit=False,
+                pilot_ids=changed
+            )
+            promotions += promoted
+            changed = {pid for pid, *_ in promoted}
+            passes += 1
+        if missions:
+            set_last_processed_mission(conn, max(mid for mid, _, _ in missions))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        forget_migrated_pilots()  # a migration may have been rolled back too
+        raise
+    finally:
+        conn.close()
 
-    while True:
-        if not is_il2_running():
-            log("IL-2 closed – stopping monitor")
-            return
+    elapsed = time.perf_counter() - started
+    log(f"[CATCHUP] {len(promotions)} promotions over {passes} mission dates in {elapsed:.2f}s")
+    return promotions, passes, elapsed
 
-        try:
-            conn = sqlite3.connect(db_path)
-            cur  = conn.cursor()
-            
-            # 1) Always rebuild the squadron→country map here
-            cur.execute("SELECT id, configID FROM squadron")
-            squadron_country = {
-                row[0]: row[1] // 1000
-                for row in cur.fetchall()
-            }
-
-            # Fetch any new missions
-            cur.execute(
-                "SELECT id, date, squadronId FROM mission WHERE id>? ORDER BY id ASC",
-                (last_mid,)
-            )
-            for mid, date_str, squadron_id in cur.fetchall():
-                log(f"=== Mission Start: {mid} ({date_str}) ===")
-                last_mid = mid
-                if date_str != last_date:
-                    last_date = date_str
-                    # ✅ migrate player stats ONCE for a new player row (if applicable)
-                    if squadron_id is not None:
-                        active_player_id = get_active_player_id(conn, squadron_id)
-                        if active_player_id:
-                            migrate_player_stats_by_description_if_needed(conn, active_player_id)
-                    # 2) Determine this mission’s “player” country (unchanged)
-                    campaign_country = 201
-                    if squadron_id is not None:
-                        cur.execute(
-                            "SELECT description FROM pilot "
-                            "WHERE personageId<>'' AND description LIKE ? LIMIT 1",
-                            (f"%startSquadronInfo={squadron_id}%",)
+# --- Monitor DB ---
+def get_data_version(conn) -> int:
+    """
+    PRAGMA data_version changes whenever another connection (the game) commits
+    to the database, so an unchanged value means there is nothing new to read.
+    """
+    return conn.execute("PRAGMA data_version").fetchall()[0][0]
+
+def monitor_db(db_path, thresholds, max_ranks, language, insignia_base,
+               sink=None, keep_running=None):
+    """
+    Poll cp.db and run a promotion pass for every new mission date, starting
+    after the last processed mission once a catch-up has recorded one.
+    Notifications go to `sink` (default: popup_queue); the loop ends when
+    `keep_running()` returns False (default: while IL-2 is running).
+    """
+    if keep_running is None:
+        keep_running = is_il2_running
+
+    # The career may have changed while the monitor was stopped
+    reset_career_caches()
+    full_scan_pending = True
+
+    # cp.db with the mod's own tables attached from the sidecar state database.
+    # Opening it can write (legacy state migration) and hit a locked database,
+    # so the first open happens in the loop like any reconnect.
+    conn = None
+    squadron_country = None
+    last_mid, last_date = None, None
+    # One long-lived connection; only query when the game has committed
+    last_version = None
+
+    try:
+        while True:
+            if not keep_running():
+                log("IL-2 closed – stopping monitor" if keep_running is is_il2_running
+                    else "Stopping monitor")
+                return
+
+            cur = None
+            try:
+                if conn is None:
+                    conn = open_career_db(db_path)
+                    last_version = None
+                if last_mid is None:
+                    # 1) Build a full squadron→country map up front
+                    squadron_country = get_squadron_country_map(conn)
+                    # Resume after the last processed mission, so missions flown
+                    # while the monitor was stopped are evaluated now. Without a
+                    # mark (no catch-up has run yet) start from the newest mission.
+                    last_mid = get_last_processed_mission(conn)
+                    if last_mid:
+                        row = conn.execute("SELECT date FROM mission WHERE id=?", (last_mid,)).fetchone()
+                        last_date = row[0] if row else None
+                    else:
+                        row = conn.execute("SELECT id, date FROM mission ORDER BY id DESC LIMIT 1").fetchone()
+                        last_mid, last_date = (row[0], row[1]) if row else (0, None)
+                    log(f"Starting mission monitor from id {last_mid}, date {last_date}")
+
+                version = get_data_version(conn)
+                if version == last_version:
+                    time.sleep(POLL_INTERVAL)
+                    continue
+                last_version = version
+                cur  = conn.cursor()
+
+                # Fetch any new missions
+                cur.execute(
+                    "SELECT id, date, squadronId FROM mission WHERE id>? ORDER BY id ASC",
+                    (last_mid,)
+                )
+                new_missions = cur.fetchall()
+                if new_missions:
+                    # 1) Squadron→country map, re-read only if the squadron table changed
+                    squadron_country = get_squadron_country_map(conn)
+                # Latest mission per squadron, for the memoized player lookup
+                latest_by_squadron = {}
+                for mid, _, squadron_id in new_missions:
+                    latest_by_squadron[squadron_id] = mid
+                for mid, date_str, squadron_id in new_missions:
+                    log(f"=== Mission Start: {mid} ({date_str}) ===")
+                    last_mid = mid
+                    if date_str != last_date:
+                        last_date = date_str
+                        evaluate_mission_date(
+                            conn,
+                            thresholds,
+                            max_ranks,
+                            language,
+                            insignia_base,
+                            squadron_id,
+                            squadron_country,
+                            last_date,
+                            latest_mission_id=latest_by_squadron.get(squadron_id),
+                            force_full_scan=full_scan_pending,
+                            sink=sink
                         )
-                        p_row = cur.fetchone()
-                        if p_row and "birthCountryInfo=" in p_row[0]:
-                            try:
-                                campaign_country = int(
-                                    p_row[0].split("birthCountryInfo=")[1].split("&")[0]
-                                )
-                            except:
-                                log(f"Failed parsing player country for sq {squadron_id}; using {campaign_country}")
-
-                    # 3) Call promotions, passing the full map
-                    check_all_pilots(
-                        conn,
-                        thresholds,
-                        max_ranks,
-                        language,
-                        insignia_base,
-                        campaign_country,
-                        squadron_id,
-                        squadron_country,
-                        last_date 
-                    )
-                    # ✅ Cleanup after promotion check
-                    cleanup_orphaned_promotion_attempts(conn)
-                    
-        except Exception as e:
-            log(f"Monitor error: {e}")
-        finally:
+                        full_scan_pending = False
+                        # ✅ Cleanup after promotion check, only when pilots went away
+                        #    (or on the periodic backstop)
+                        cleanup_reason = orphan_cleanup_reason(conn)
+                        if cleanup_reason:
+                            cleanup_orphaned_promotion_attempts(conn, cleanup_reason)
+                if new_missions and get_last_processed_mission(conn):
+                    # A later catch-up starts after what the monitor already handled.
+                    # With no mark yet the missions before our start were never
+                    # evaluated, so the first catch-up sets it instead.
+                    set_last_processed_mission(conn, last_mid)
+                    conn.commit()
+
+            except Exception as e:
+                log(f"Monitor error: {e}")
+                # Whatever this pass did not write is re-checked on the next one
+                full_scan_pending = True
+                # Reconnect on the next poll in case the connection went bad
+                if conn is not None:
+                    conn.close()
+                    conn = None
+            else:
+                if cur is not None:
+                    cur.close()
+
+            time.sleep(POLL_INTERVAL)
+    finally:
+        if conn is not None:
             conn.close()
 
-        time.sleep(POLL_INTERVAL)
@@ -9,7 +9,6 @@ from PIL import Image, ImageTk, ImageDraw, ImageFont
 import ctypes
 import psutil
 import sys
-import queue
 import unicodedata
 from datetime import datetime, timedelta
 from config import (
@@ -26,10 +25,11 @@ from certificates import (
       generate_certificate_image_GB,
   )
 from helpers import load_private_font, is_il2_running
+from ranks import load_rank_catalog
+from popup_render import PrerenderQueue
 import promotion, ui
-from ui import show_next_popup
 
-popup_queue = queue.Queue()
+popup_queue = ui.NotifyingQueue()
 
 promotion.popup_queue = popup_queue
 ui.popup_queue = popup_queue       
@@ -82,11 +82,15 @@ def main():
     insignia_base = os.path.join(gp, "data", "swf", "il2", "charactersranks")
     # inject into ui.py so it can do get_rank_name(..., INSIGNIA_BASE, ...)
     ui.INSIGNIA_BASE = insignia_base
+    # read all rank names/insignia once (or from the cache file)
+    load_rank_catalog(insignia_base)
+    # player promotions are rendered off the Tk thread before they are queued
+    promotion.popup_queue = PrerenderQueue(popup_queue, insignia_base)
     
     global _root
     _root = root
-    # schedule our pop-up dispatcher
-    root.after(100, show_next_popup)
+    # wake the pop-up dispatcher whenever something is queued
+    ui.start_popup_dispatcher(root)
     ctypes.windll.user32.SetProcessDPIAware()
 
     def monitor_thread():
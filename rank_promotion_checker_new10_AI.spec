@@ -22,7 +22,7 @@ a = Analysis(
         ('certificate_template.png',    '.'),
         ('Promotion_certificate_US.png','.'), 
         ('Promotion_certificate_RU.png','.'), 
-        ('Promotion_certificate_GB.png','.'), 
+        ('promotion_certificate_GB.png','.'), 
 
         # fonts
         ('SpecialElite.ttf',        '.'),
@@ -1,5 +1,131 @@
 import os
+import json
+import threading
 from config import *
+from logger import log
+
+# --- Rank catalog ---
+# Everything under data/swf/il2/charactersranks is read once into memory:
+#   { "101005": {"names": {"rus": "...", "eng": "..."}, "images": ["big.png", ...]}, ... }
+# and saved to RANK_CACHE_FILE so the next launch can skip the directory scan.
+# A cached catalog is used straight away while a background thread compares its
+# signature (rank folder/file counts and the newest mtime among them) with the
+# folder and rescans if it changed. Lookups only ever read memory; call
+# load_rank_catalog(base, refresh=True) after installing new ranks mid-session.
+RANK_IMAGE_FILES = ("big.png", "big.1943.png", "inline.png", "inline.1943.png")
+
+_catalogs = {}
+_catalog_lock = threading.Lock()
+
+def _read_rank_name(info_file):
+    with open(info_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if "&name=" in line:
+                return line.split('"')[1]
+    return ""
+
+def _dir_signature(base_path):
+    """[rank folders, files in them, newest mtime_ns] for charactersranks, or None."""
+    try:
+        newest = os.stat(base_path).st_mtime_ns
+        folders = files = 0
+        with os.scandir(base_path) as entries:
+            for entry in entries:
+                if not (entry.name.isdigit() and entry.is_dir()):
+                    continue
+                folders += 1
+                newest = max(newest, entry.stat().st_mtime_ns)
+                with os.scandir(entry.path) as rank_files:
+                    for f in rank_files:
+                        files += 1
+                        newest = max(newest, f.stat().st_mtime_ns)
+        return [folders, files, newest]
+    except OSError:
+        return None
+
+def scan_rank_catalog(base_path):
+    """Walk the charactersranks folder and return {rank folder: entry}."""
+    ranks = {}
+    try:
+        folders = os.listdir(base_path)
+    except OSError:
+        return ranks
+    for folder in folders:
+        if not folder.isdigit():
+            continue
+        path = os.path.join(base_path, folder)
+        try:
+            files = os.listdir(path)
+        except OSError:
+            continue
+        names = {}
+        for fn in files:
+            if fn.startswith("info.locale=") and fn.endswith(".txt"):
+                locale = fn[len("info.locale="):-len(".txt")]
+                try:
+                    names[locale] = _read_rank_name(os.path.join(path, fn))
+                except (OSError, UnicodeDecodeError, IndexError):
+                    names[locale] = ""
+        images = [fn for fn in RANK_IMAGE_FILES if fn in files]
+        ranks[folder] = {"names": names, "images": images}
+    return ranks
+
+def _build_catalog(base_path):
+    """Scan base_path, save the result to RANK_CACHE_FILE and return it."""
+    signature = _dir_signature(base_path) if base_path else None
+    ranks = scan_rank_catalog(base_path) if base_path else {}
+    catalog = {"base": base_path, "signature": signature, "ranks": ranks}
+    if signature is not None:
+        try:
+            with open(RANK_CACHE_FILE, "w", encoding="utf-8") as f:
+                json.dump(catalog, f, ensure_ascii=False)
+        except OSError as e:
+            log(f"Failed to write rank cache: {e}")
+    log(f"Scanned {len(ranks)} rank folders in {base_path}")
+    return catalog
+
+def _verify_cached_catalog(base_path, cached):
+    """Rescan in the background if the folder no longer matches the cached catalog."""
+    if _dir_signature(base_path) == cached["signature"]:
+        return
+    catalog = _build_catalog(base_path)
+    with _catalog_lock:
+        if _catalogs.get(base_path) is cached:
+            _catalogs[base_path] = catalog
+
+def load_rank_catalog(base_path, refresh=False):
+    """
+    Return the catalog for base_path, from memory, RANK_CACHE_FILE (checked
+    against the folder in the background) or a fresh scan, in that order.
+    refresh=True always rescans.
+    """
+    with _catalog_lock:
+        catalog = _catalogs.get(base_path)
+        if catalog and not refresh:
+            return catalog
+
+        catalog = None
+        if not refresh and base_path and os.path.exists(RANK_CACHE_FILE):
+            try:
+                with open(RANK_CACHE_FILE, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                if cached.get("base") == base_path and cached.get("signature") is not None:
+                    catalog = cached
+            except (OSError, ValueError):
+                pass
+
+        if catalog is None:
+            catalog = _build_catalog(base_path)
+        else:
+            threading.Thread(target=_verify_cached_catalog, args=(base_path, catalog),
+                             name="rank-catalog-check", daemon=True).start()
+
+        _catalogs[base_path] = catalog
+        return catalog
+
+def _rank_entry(base_path, country, rank):
+    catalog = _catalogs.get(base_path) or load_rank_catalog(base_path)
+    return catalog["ranks"].get(f"{country*1000+rank}", {"names": {}, "images": []})
 
 def get_rank_name(country, rank, year, base_path, locale):
     """
@@ -8,33 +134,19 @@ def get_rank_name(country, rank, year, base_path, locale):
     """
     # For Soviet ranks (country 101), always use the Russian locale
     lookup_locale = 'rus' if country == 101 else locale
-    folder = os.path.join(base_path, f"{country*1000+rank}")
-    info_file = os.path.join(folder, f"info.locale={lookup_locale}.txt")
-    if not os.path.exists(info_file):
-        info_file = os.path.join(folder, f"info.locale=eng.txt")
-    if not os.path.exists(info_file):
-        return ""
-    with open(info_file, "r", encoding="utf-8") as f:
-        for line in f:
-            if "&name=" in line:
-                return line.split('"')[1]
-    return ""
-    
+    names = _rank_entry(base_path, country, rank)["names"]
+    if lookup_locale in names:
+        return names[lookup_locale]
+    return names.get("eng", "")
+
 def get_rank_title_path(country, rank, year, base, loc):
     folder = os.path.join(base, f"{country*1000+rank}")
     png    = "big.1943.png" if (country == 101 and year >= 1943) else "big.png"
-    titlef = os.path.join(folder, f"info.locale={loc}.txt")
     imgf   = os.path.join(folder, png)
-    title  = ""
-    if os.path.exists(titlef):
-        with open(titlef, "r", encoding="utf-8") as f:
-            for line in f:
-                if "&name=" in line:
-                    title = line.split('"')[1]
-                    break
+    title  = _rank_entry(base, country, rank)["names"].get(loc, "")
     return imgf, title
 
 def get_small_insignia_path(country, rank, year, base):
     folder = os.path.join(base, f"{country*1000+rank}")
     png    = "inline.1943.png" if (country == 101 and year >= 1943) else "inline.png"
-    return os.path.join(folder, png)
\ No newline at end of file
+    return os.path.join(folder, png)
@@ -0,0 +1,81 @@
+# sinks.py
+import json
+import threading
+from datetime import datetime
+from logger import log
+
+# --- Notification sinks ---
+# Anything with put(note) can receive check_all_pilots' notifications. The GUI
+# uses a queue feeding the Tk pop-ups; headless runs use the sinks below. Notes:
+#   ("player", ceremony, insignia, rank_title, language, country,
+#    first, last, old_rank, new_rank, date)
+#   ("ai", name, insignia_before, insignia_after, rank_title, language)
+#   ("ai_digest", [(name, insignia_before, insignia_after, rank_title), ...], language)
+
+def note_to_record(note) -> dict:
+    """Plain dict of a notification tuple, for JSON output."""
+    kind = note[0]
+    if kind == "player":
+        (_, ceremony, insignia, title, language, country,
+         first, last, old_rank, new_rank, date) = note
+        return {
+            "kind": kind, "name": f"{first} {last}".strip(), "country": country,
+            "old_rank": old_rank, "new_rank": new_rank, "rank_title": title,
+            "date": date, "language": language,
+            "insignia": insignia, "ceremony": ceremony,
+        }
+    if kind == "ai":
+        _, name, before, after, title, language = note
+        return {
+            "kind": kind, "name": name, "rank_title": title, "language": language,
+            "insignia_before": before, "insignia_after": after,
+        }
+    if kind == "ai_digest":
+        _, entries, language = note
+        return {
+            "kind": kind, "language": language,
+            "pilots": [
+                {"name": name, "rank_title": title,
+                 "insignia_before": before, "insignia_after": after}
+                for name, before, after, title in entries
+            ],
+        }
+    return {"kind": kind, "data": list(note[1:])}
+
+
+class NullSink:
+    """Drops every notification."""
+
+    def put(self, note):
+        pass
+
+
+class CallbackSink:
+    """Calls `callback(note)` for every notification; errors are logged, not raised."""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def put(self, note):
+        try:
+            self.callback(note)
+        except Exception as e:
+            log(f"[SINK] Callback failed for {note[0]} notification: {e}")
+
+
+class JsonlSink:
+    """Appends one JSON object per notification to `path`."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def put(self, note):
+        record = {"logged": datetime.now().isoformat(timespec="seconds"), **note_to_record(note)}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                log(f"[SINK] Failed to write {self.path}: {e}")
@@ -0,0 +1,114 @@
+# state_db.py
+import os
+import sqlite3
+from config import STATE_DB_FILE
+from logger import log
+
+# --- Sidecar state database ---
+# The mod's own tables live in STATE_DB_FILE next to cp.db and are ATTACHed
+# to the game connection as schema "rankmod", so bookkeeping writes don't take
+# the game's database lock or grow cp.db. Cross-database queries (e.g. the
+# orphan cleanup against pilot) work through the attachment.
+STATE_SCHEMA = "rankmod"
+
+STATE_TABLES = {
+    "promotion_attempts": """
+        CREATE TABLE IF NOT EXISTS rankmod.promotion_attempts (
+            pilotId INTEGER PRIMARY KEY,
+            last_attempt TEXT,
+            last_success INTEGER,
+            fail_count INTEGER DEFAULT 0
+        )
+    """,
+    "rankmod_player_migrations": """
+        CREATE TABLE IF NOT EXISTS rankmod.rankmod_player_migrations (
+            oldPilotId INTEGER,
+            newPilotId INTEGER PRIMARY KEY,
+            migratedOn TEXT
+        )
+    """,
+    "mission_progress": """
+        CREATE TABLE IF NOT EXISTS rankmod.mission_progress (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            lastMissionId INTEGER,
+            updatedOn TEXT
+        )
+    """,
+    "cleanup_runs": """
+        CREATE TABLE IF NOT EXISTS rankmod.cleanup_runs (
+            ranOn TEXT,
+            removed INTEGER,
+            reason TEXT
+        )
+    """,
+}
+
+STATE_INDEXES = [
+    """CREATE INDEX IF NOT EXISTS rankmod.idx_player_migrations_old
+       ON rankmod_player_migrations(oldPilotId)""",
+]
+
+STATE_COLUMNS = {
+    "promotion_attempts": "pilotId, last_attempt, last_success, fail_count",
+    "rankmod_player_migrations": "oldPilotId, newPilotId, migratedOn",
+}
+
+def state_db_path(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), STATE_DB_FILE)
+
+def migrate_legacy_state(conn):
+    """
+    One-time move of the tables older versions created inside cp.db.
+    Rows already in the sidecar win; the cp.db copy is dropped afterwards.
+    """
+    for table, columns in STATE_COLUMNS.items():
+        exists = conn.execute(
+            "SELECT 1 FROM main.sqlite_master WHERE type='table' AND name=?", (table,)
+        ).fetchall()
+        if not exists:
+            continue
+        cur = conn.execute(
+            f"INSERT OR IGNORE INTO {STATE_SCHEMA}.{table} ({columns}) "
+            f"SELECT {columns} FROM main.{table}"
+        )
+        moved = cur.rowcount
+        conn.execute(f"DROP TABLE main.{table}")
+        conn.commit()
+        log(f"[STATE] Moved {moved} rows of {table} from cp.db to {STATE_DB_FILE}")
+
+def attach_state_db(conn, db_path):
+    """ATTACH the sidecar to `conn` as 'rankmod' and make sure its schema exists."""
+    attached = {row[1] for row in conn.execute("PRAGMA database_list").fetchall()}
+    if STATE_SCHEMA not in attached:
+        conn.commit()  # ATTACH is not allowed inside a transaction
+        conn.execute(f"ATTACH DATABASE ? AS {STATE_SCHEMA}", (state_db_path(db_path),))
+        conn.execute(f"PRAGMA {STATE_SCHEMA}.journal_mode=WAL").fetchall()
+    for sql in STATE_TABLES.values():
+        conn.execute(sql)
+    for sql in STATE_INDEXES:
+        conn.execute(sql)
+    conn.commit()
+    migrate_legacy_state(conn)
+
+def get_last_processed_mission(conn) -> int:
+    """Highest mission id the monitor or a catch-up has evaluated (0 if none)."""
+    row = conn.execute(
+        f"SELECT lastMissionId FROM {STATE_SCHEMA}.mission_progress WHERE id=1"
+    ).fetchone()
+    return row[0] if row and row[0] is not None else 0
+
+def set_last_processed_mission(conn, mission_id):
+    """Record mission_id as processed (never moves backwards). Does not commit."""
+    conn.execute(
+        f"INSERT INTO {STATE_SCHEMA}.mission_progress (id, lastMissionId, updatedOn) "
+        "VALUES (1, ?, datetime('now')) "
+        "ON CONFLICT(id) DO UPDATE SET "
+        "lastMissionId=MAX(lastMissionId, excluded.lastMissionId), updatedOn=excluded.updatedOn",
+        (mission_id,)
+    )
+
+def open_career_db(db_path):
+    """Connect to cp.db with the mod's state database attached."""
+    conn = sqlite3.connect(db_path)
+    attach_state_db(conn, db_path)
+    return conn
@@ -4,27 +4,22 @@ import tkinter as tk
 import threading
 import unicodedata
 from tkinter import font as tkfont
-from PIL import Image, ImageTk
+from PIL import ImageTk
 from logger import log
 import queue
 from config import *
-from helpers import spaced_out_name, parse_flexible_date, get_tk_font
-from ranks import get_rank_name
-from certificates import (
-    generate_certificate_image_DE, generate_certificate_image_US,
-    generate_certificate_image_CCCP, generate_certificate_image_GB
-)
-from popup_render import render_promotion_popup_to_image
+from helpers import spaced_out_name, get_tk_font
+from image_cache import load_scaled
+from popup_render import prepare_player_promotion, render_promotion_popup_to_image, save_certificate
 
 # will be injected by main.py after computing insignia_base
 INSIGNIA_BASE = None
     
-# --- Player Popup (unchanged) ---
-def show_promotion_popup(ceremony, insignia, rank_title, language, on_close,
-                         country=None, first=None, last=None,
-                         old_rank_id=None, new_rank_id=None, latest_mission_date=None
-                         ):
-    
+# --- Player Popup ---
+def show_promotion_popup(render, on_close):
+    """Show a PromotionRender prepared by popup_render.prepare_player_promotion."""
+    language   = render.language
+    rank_title = render.rank_title
 
     popup = tk.Toplevel(_root)
     popup.attributes("-alpha", 1.0)
@@ -52,71 +47,16 @@ def show_promotion_popup(ceremony, insignia, rank_title, language, on_close,
     # Left: Ceremony
     left = tk.Frame(outer, bg="#191919")
     left.pack(side="left", anchor="n")
-    if ceremony and os.path.exists(ceremony):
-        img_c = Image.open(ceremony)
-        ph_c  = ImageTk.PhotoImage(img_c, master=popup)
+    if render.ceremony_img:
+        ph_c  = ImageTk.PhotoImage(render.ceremony_img, master=popup)
         lbl_c = tk.Label(left, image=ph_c, bg="#191919")
         lbl_c.image = ph_c
         lbl_c.pack(padx=(10,20), pady=10)
-    else:
-        log(f"Ceremony missing: {ceremony}")
-
-    # Middle: certificate for all countries (dynamic)
-    template_map = {
-        country: os.path.join(RESOURCE_PATH, filename)
-        for country, filename in {
-            201: "certificate_template.png",
-            103: "Promotion_certificate_US.png",
-            101: "Promotion_certificate_RU.png",
-            102: "Promotion_certificate_GB.png"
-        }.items()
-    }
-
-    # --- Get name, ranks, locale ---
-    name = f"{first} {last}".strip() if first and last else ""
-    locale = LOCALE_MAP.get(language.upper(), "eng") #if LOCALE_MAP else "eng"
-    year = None
-    try:
-        year = parse_flexible_date(latest_mission_date).year if latest_mission_date else 1941
-    except Exception:
-        year = 1941
-
-    # Dynamic rank fetching
-    old_rank = get_rank_name(country, old_rank_id, year, INSIGNIA_BASE, locale) if old_rank_id is not None else ""
-    new_rank = get_rank_name(country, new_rank_id, year, INSIGNIA_BASE, locale) if new_rank_id is not None else ""
-
-
-    # --- Certificate generator dispatch ---
-    cert_img = None
-    if country in template_map and os.path.exists(template_map[country]):
-        template_path = template_map[country]
-        if country == 201:
-            cert_img = generate_certificate_image_DE(template_path, name, old_rank, new_rank, latest_mission_date)
-        elif country == 103:
-            cert_img = generate_certificate_image_US(template_path, name, old_rank, new_rank, latest_mission_date)
-        elif country == 101:
-            cert_img = generate_certificate_image_CCCP(template_path, name, old_rank, new_rank, latest_mission_date)
-        elif country == 102:
-            cert_img = generate_certificate_image_GB(template_path, name, old_rank, new_rank, latest_mission_date)
-    else:
-        log(f"No template for country {country}, or template not found.")
 
-    # --- Save and show certificate ---
+    # Middle: certificate rendered by prepare_player_promotion
+    cert_img = render.cert_img
     if cert_img:
-        filename = f"promotion_certificate_{country}_{name.replace(' ', '_')}_{new_rank}_{latest_mission_date}.png"
-        try:
-            cert_img.save(filename)
-            log(f"Certificate saved to {filename}")
-        except Exception as e:
-            log(f"Failed to save certificate: {e}")
-
-        factor = 1  # adjust as needed for scaling
-        cert_width = int(cert_img.width * factor)
-        cert_height = int(cert_img.height * factor)
-        cert_tk = ImageTk.PhotoImage(
-            cert_img.resize((cert_width, cert_height), Image.LANCZOS),
-            master=popup
-        )
+        cert_tk = ImageTk.PhotoImage(cert_img, master=popup)
 
         mid = tk.Frame(outer, bg="#191919")
         mid.pack(side="left", anchor="n", padx=(0, 20))
@@ -146,16 +86,11 @@ def show_promotion_popup(ceremony, insignia, rank_title, language, on_close,
         content, text=intro_text, fg="#dadada", bg="#191919",
         font=font_c, justify="center"
     ).pack(pady=(0,4))
-    if os.path.exists(insignia):
-        img_i = Image.open(insignia)
-        w, h = img_i.size
-        img_i = img_i.resize((int(w*1.3), int(h*1.3)), Image.LANCZOS)
-        ph_i  = ImageTk.PhotoImage(img_i, master=popup)
+    if render.insignia_img:
+        ph_i  = ImageTk.PhotoImage(render.insignia_img, master=popup)
         lbl_i = tk.Label(content, image=ph_i, bg="#191919")
         lbl_i.image = ph_i
         lbl_i.pack(pady=(0,4))
-    else:
-        log(f"Insignia missing: {insignia}")
     tk.Label(
         content, text=rank_title, fg="#4ea5f5", bg="#191919",
         font=font_c, justify="center"
@@ -198,6 +133,41 @@ def show_promotion_popup(ceremony, insignia, rank_title, language, on_close,
     return popup
 
 
+# --- AI Popup texts ---
+AI_HEADERS = {
+    "ENG":"Promotion news",
+    "DEU":"Beförderungsmitteilung",
+    "RU":"Новости о повышении",
+    "CHS":"晋升通知",
+    "ESP":"Noticias de ascenso",
+    "FRA":"Annonce de promotion",
+    "POL":"Aktualności o awansie"
+}
+
+AI_SUBS = {
+    "ENG":"The High Command is happy to announce the following promotions:",
+    "DEU":"Das Oberkommando freut sich, folgende Beförderungen bekanntzugeben:",
+    "RU":"Высокое командование с радостью сообщает о следующих повышениях:",
+    "CHS":"总司令部很高兴地宣布以下晋升：",
+    "ESP":"El Alto Mando se complace en anunciar los siguientes ascensos:",
+    "FRA":"Le Haut Commandement est heureux d’annoncer les promotions suivantes :",
+    "POL":"Wysokie Dowództwo z przyjemnością ogłasza następujące awanse:"
+}
+
+AI_PROMOTION_TEXTS = {
+    "ENG": "{name} – Promotion to {rank_title}",
+    "DEU": "{name} – Beförderung zu {rank_title}",
+    "RU":  "{name} – повышение до {rank_title}",
+    "CHS": "{name} – 晋升为{rank_title}",
+    "ESP": "{name} – Ascenso a {rank_title}",
+    "FRA": "{name} – Promotion au grade {rank_title}",
+    "POL": "{name} – Awans do {rank_title}"
+}
+
+def ai_promotion_text(name, rank_title, language):
+    template = AI_PROMOTION_TEXTS.get(language, AI_PROMOTION_TEXTS["ENG"])
+    return template.format(name=name, rank_title=rank_title)
+
 # --- AI Popup (updated signature) ---
 def show_ai_promotion_popup(name, before_insignia, after_insignia, rank_title, language, on_close):
     """
@@ -215,28 +185,8 @@ def show_ai_promotion_popup(name, before_insignia, after_insignia, rank_title, l
     outer = tk.Frame(popup, bg="#191919")
     outer.pack(padx=3, pady=3)
 
-    headers = {
-        "ENG":"Promotion news",
-        "DEU":"Beförderungsmitteilung",
-        "RU":"Новости о повышении",
-        "CHS":"晋升通知",
-        "ESP":"Noticias de ascenso",
-        "FRA":"Annonce de promotion",
-        "POL":"Aktualności o awansie"
-    }
-    
-    subs = {
-        "ENG":"The High Command is happy to announce the following promotions:",
-        "DEU":"Das Oberkommando freut sich, folgende Beförderungen bekanntzugeben:",
-        "RU":"Высокое командование с радостью сообщает о следующих повышениях:",
-        "CHS":"总司令部很高兴地宣布以下晋升：",
-        "ESP":"El Alto Mando se complace en anunciar los siguientes ascensos:",
-        "FRA":"Le Haut Commandement est heureux d’annoncer les promotions suivantes :",
-        "POL":"Wysokie Dowództwo z przyjemnością ogłasza następujące awanse:"
-    }
-
     # Header
-    header_text = headers.get(language, headers["ENG"])
+    header_text = AI_HEADERS.get(language, AI_HEADERS["ENG"])
     font_h = get_tk_font(header_text, size=18, weight="bold", context="ui")
     tk.Label(
         outer,
@@ -247,7 +197,7 @@ def show_ai_promotion_popup(name, before_insignia, after_insignia, rank_title, l
     ).pack(anchor="w", pady=(10,4), padx=10)
 
     # Subtext
-    sub_text = subs.get(language, subs["ENG"])
+    sub_text = AI_SUBS.get(language, AI_SUBS["ENG"])
     font_s = get_tk_font(sub_text, size=14, context="ui")
     tk.Label(
         outer,
@@ -265,9 +215,7 @@ def show_ai_promotion_popup(name, before_insignia, after_insignia, rank_title, l
 
     # 3a) Before-promotion insignia
     if os.path.exists(before_insignia):
-        img_b = Image.open(before_insignia)
-        w_b, h_b = img_b.size
-        img_b = img_b.resize((int(w_b * 0.7), int(h_b * 0.7)), Image.LANCZOS)
+        img_b = load_scaled(before_insignia, factor=0.7)
         ph_b  = ImageTk.PhotoImage(img_b, master=popup)
         tk.Label(row, image=ph_b, bg="#191919").pack(side="left", padx=(0,8))
         row.before_photo = ph_b
@@ -275,18 +223,8 @@ def show_ai_promotion_popup(name, before_insignia, after_insignia, rank_title, l
         log(f"AI before-insignia missing: {before_insignia}")
 
     # 3b) Name + "Promotion to <rank_title>"
-    texts = {
-        "ENG": f"{name} – Promotion to {rank_title}",
-        "DEU": f"{name} – Beförderung zu {rank_title}",
-        "RU":  f"{name} – повышение до {rank_title}",
-        "CHS": f"{name} – 晋升为{rank_title}",
-        "ESP": f"{name} – Ascenso a {rank_title}",
-        "FRA": f"{name} – Promotion au grade {rank_title}",
-        "POL": f"{name} – Awans do {rank_title}"
-    }
-    
     # Name + Promotion text
-    promotion_text = texts.get(language, texts["ENG"])
+    promotion_text = ai_promotion_text(name, rank_title, language)
     font_n = get_tk_font(promotion_text, size=16, context = "ui")
     tk.Label(
         row,
@@ -299,9 +237,7 @@ def show_ai_promotion_popup(name, before_insignia, after_insignia, rank_title, l
 
     # 3c) After-promotion insignia
     if os.path.exists(after_insignia):
-        img_a = Image.open(after_insignia)
-        w_a, h_a = img_a.size
-        img_a = img_a.resize((int(w_a * 0.7), int(h_a * 0.7)), Image.LANCZOS)
+        img_a = load_scaled(after_insignia, factor=0.7)
         ph_a  = ImageTk.PhotoImage(img_a, master=popup)
         tk.Label(row, image=ph_a, bg="#191919").pack(side="left", padx=(8,0))
         row.after_photo = ph_a
@@ -314,11 +250,161 @@ def show_ai_promotion_popup(name, before_insignia, after_insignia, rank_title, l
     popup.geometry(f"{rw}x{rh}+{(sw-rw)//2}+{(sh-rh)//2}")
     popup.after(10000, on_close)
     return popup
+
+# --- AI digest popup ---
+AI_DIGEST_VISIBLE_ROWS = 6
+
+def show_ai_digest_popup(entries, language, on_close):
+    """
+    One popup for all AI promotions of a mission.
+    entries: [(name, before_insignia, after_insignia, rank_title), ...]
+    Only AI_DIGEST_VISIBLE_ROWS row widgets are built; scrolling re-fills them,
+    so the popup costs the same for 3 or 300 promoted pilots.
+    """
+    popup = tk.Toplevel(_root)
+    popup.overrideredirect(True)
+    popup.attributes("-topmost", True)
+    popup.configure(bg="#3f3f3f")
+
+    outer = tk.Frame(popup, bg="#191919")
+    outer.pack(padx=3, pady=3)
+
+    # Header
+    header_text = AI_HEADERS.get(language, AI_HEADERS["ENG"])
+    font_h = get_tk_font(header_text, size=18, weight="bold", context="ui")
+    tk.Label(
+        outer,
+        text=header_text,
+        fg="#dadada",
+        bg="#191919",
+        font=font_h
+    ).pack(anchor="w", pady=(10,4), padx=10)
+
+    # Subtext
+    sub_text = AI_SUBS.get(language, AI_SUBS["ENG"])
+    font_s = get_tk_font(sub_text, size=14, context="ui")
+    tk.Label(
+        outer,
+        text=sub_text,
+        fg="#dadada",
+        bg="#191919",
+        font=font_s,
+        wraplength=400,
+        justify="left"
+    ).pack(anchor="w", pady=(0,8), padx=10)
+
+    texts = [ai_promotion_text(name, title, language) for name, _, _, title in entries]
+    # One font for every row, chosen for the most demanding script in the list
+    font_n = get_tk_font(" ".join(texts), size=16, context="ui")
+    text_width = max(len(t) for t in texts)
+
+    body = tk.Frame(outer, bg="#191919")
+    body.pack(anchor="w", pady=(0,10), padx=10, fill="x")
+    rows_frame = tk.Frame(body, bg="#191919")
+    rows_frame.pack(side="left", fill="x")
+
+    photos = {}  # insignia path -> PhotoImage, built on first display
+    def photo(path):
+        if path not in photos:
+            photos[path] = (
+                ImageTk.PhotoImage(load_scaled(path, factor=0.7), master=popup)
+                if os.path.exists(path) else ""
+            )
+        return photos[path]
+
+    rows = []
+    for _ in range(min(len(entries), AI_DIGEST_VISIBLE_ROWS)):
+        row = tk.Frame(rows_frame, bg="#191919")
+        row.pack(anchor="w", pady=2)
+        before = tk.Label(row, bg="#191919")
+        before.pack(side="left", padx=(0,8))
+        text = tk.Label(row, fg="#dadada", bg="#191919", font=font_n,
+                        justify="left", anchor="w", width=text_width)
+        text.pack(side="left")
+        after = tk.Label(row, bg="#191919")
+        after.pack(side="left", padx=(8,0))
+        rows.append((before, text, after))
+
+    first_row = [0]
+    scrollbar = None
+
+    def show_from(first):
+        first = max(0, min(first, len(entries) - len(rows)))
+        first_row[0] = first
+        for (before, text, after), i in zip(rows, range(first, first + len(rows))):
+            _, before_ins, after_ins, _ = entries[i]
+            before.config(image=photo(before_ins))
+            text.config(text=texts[i])
+            after.config(image=photo(after_ins))
+        if scrollbar is not None:
+            scrollbar.set(first / len(entries), (first + len(rows)) / len(entries))
+
+    def on_scroll(action, amount, unit=None):
+        if action == "moveto":
+            show_from(round(float(amount) * len(entries)))
+        elif action == "scroll":
+            step = len(rows) if unit == "pages" else 1
+            show_from(first_row[0] + int(amount) * step)
+
+    if len(entries) > len(rows):
+        scrollbar = tk.Scrollbar(body, orient="vertical", command=on_scroll)
+        scrollbar.pack(side="right", fill="y")
+        popup.bind_all(
+            "<MouseWheel>",
+            lambda e: show_from(first_row[0] - (1 if e.delta > 0 else -1))
+        )
+        popup.bind("<Destroy>", lambda e: popup.unbind_all("<MouseWheel>") if e.widget is popup else None)
+
+    show_from(0)
+
+    popup.update_idletasks()
+    rw, rh = popup.winfo_reqwidth(), popup.winfo_reqheight()
+    sw, sh = popup.winfo_screenwidth(), popup.winfo_screenheight()
+    popup.geometry(f"{rw}x{rh}+{(sw-rw)//2}+{(sh-rh)//2}")
+    popup.after(10000, on_close)
+    return popup
     
 # ——————————————————————————————————————————————————————————————————
+# 0) Wake-up instead of polling: every put() on the popup queue posts a
+#    virtual event to the Tk loop, which stays idle while nothing arrives
+POPUP_QUEUED_EVENT = "<<PromotionQueued>>"
+
+_popup_showing = False
+
+class NotifyingQueue(queue.Queue):
+    """queue.Queue that calls on_put() after every put(), from any thread."""
+
+    def __init__(self, maxsize=0):
+        super().__init__(maxsize)
+        self.on_put = None
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        if self.on_put is not None:
+            self.on_put()
+
+def _wake_popup_dispatcher():
+    # Called from the monitor/render threads; Tk marshals it to the main loop
+    try:
+        _root.event_generate(POPUP_QUEUED_EVENT, when="tail")
+    except (RuntimeError, tk.TclError) as e:
+        # Main loop not running (yet/anymore); start_popup_dispatcher drains later
+        log(f"Popup wake-up not delivered: {e}")
+
+def _on_popup_queued(event=None):
+    if not _popup_showing:
+        show_next_popup()
+
+def start_popup_dispatcher(root):
+    """Hook popup_queue up to the Tk loop and show anything already queued."""
+    root.bind(POPUP_QUEUED_EVENT, _on_popup_queued)
+    popup_queue.on_put = _wake_popup_dispatcher
+    root.after_idle(_on_popup_queued)
+
 # 1) New dispatcher — pulls one item, shows it, and only when
 #    the popup destroys itself does it call itself again
 def show_next_popup():
+    global _popup_showing
     popup = None
     
     def on_close():
@@ -332,15 +418,21 @@ def show_next_popup():
     try:
         kind, *args = popup_queue.get_nowait()
     except queue.Empty:
-        # keep polling until there is something to show
-        _root.after(100, show_next_popup)
+        # nothing left; the next put() wakes us through POPUP_QUEUED_EVENT
+        _popup_showing = False
         return
+    _popup_showing = True
     log(f"Dequeued popup kind: {kind}, args: {args}")
     
 
     try:
         if kind == "ai":
             popup = show_ai_promotion_popup(*args, on_close=on_close)
+        elif kind == "ai_digest":
+            popup = show_ai_digest_popup(*args, on_close=on_close)
+        elif kind == "player_rendered":
+            # Already rendered and saved by popup_render.PrerenderQueue
+            popup = show_promotion_popup(args[0], on_close)
         else:
             log(f"Showing promotion ceremony for player: {args}")
             # Separate out the player args and pass explicitly
@@ -348,25 +440,20 @@ def show_next_popup():
                 ceremony, insignia, rank_title, language,
                 country, first, last, old_rank_id, new_rank_id, latest_mission_date
             ) = args
-            popup = show_promotion_popup(
-                ceremony, insignia, rank_title, language, on_close,
+            # Render certificate, rank names and insignia once for both outputs
+            render = prepare_player_promotion(
+                ceremony, insignia, rank_title, language,
                 country=country, first=first, last=last,
                 old_rank_id=old_rank_id, new_rank_id=new_rank_id,
-                latest_mission_date=latest_mission_date
+                latest_mission_date=latest_mission_date,
+                INSIGNIA_BASE=INSIGNIA_BASE
             )
-            # Automatically render a clean, image-only version in the background
+            popup = show_promotion_popup(render, on_close)
+            save_certificate(render)
+            # Automatically save a clean, image-only version in the background
             threading.Thread(
                 target=render_promotion_popup_to_image,
-                args=(ceremony, insignia, rank_title, language),
-                kwargs=dict(
-                    country=country,
-                    first=first,
-                    last=last,
-                    old_rank_id=old_rank_id,
-                    new_rank_id=new_rank_id,
-                    latest_mission_date=latest_mission_date,
-                    INSIGNIA_BASE=INSIGNIA_BASE
-                ),
+                args=(render,),
                 daemon=True
             ).start()
     except Exception as e: